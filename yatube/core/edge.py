@@ -0,0 +1,105 @@
+"""Кэширование страниц на обратном прокси (edge).
+
+edge_cache выставляет заголовки Cache-Control и Surrogate-Key,
+purge сбрасывает на прокси страницы с указанными ключами.
+Куда отправляется сброс, задает настройка EDGE_PURGE_BACKEND:
+LoggingPurgeBackend только пишет ключи в лог, LocalPurgeBackend
+запоминает последние ключи (для тестов), HttpPurgeBackend
+отправляет запрос на прокси."""
+import functools
+import logging
+from collections import deque
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+from .tasks import enqueue
+
+logger = logging.getLogger(__name__)
+
+PURGE_BACKEND = 'core.edge.LoggingPurgeBackend'
+PURGE_TIMEOUT = 5
+# Сколько последних ключей хранит LocalPurgeBackend
+LOCAL_PURGED_LIMIT = 1000
+
+
+def edge_cache(max_age=0, s_maxage=60, keys=None):
+    """Разрешает прокси хранить страницу s_maxage секунд,
+    браузеру - max_age. keys(request, *args, **kwargs) возвращает
+    ключи, по которым страницу можно сбросить через purge.
+    Страницы вошедших пользователей остаются приватными."""
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            response = view(request, *args, **kwargs)
+            if response.status_code not in (200, 304):
+                return response
+            if request.user.is_authenticated:
+                patch_cache_control(response, private=True, max_age=0)
+                return response
+            patch_cache_control(
+                response, public=True, max_age=max_age, s_maxage=s_maxage
+            )
+            if keys is not None:
+                response['Surrogate-Key'] = ' '.join(
+                    keys(request, *args, **kwargs)
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+class LoggingPurgeBackend:
+    """Заглушка прокси: только пишет сброшенные ключи в лог."""
+
+    def purge(self, keys):
+        logger.debug('Сброс кэша прокси: %s', ' '.join(keys))
+
+
+class LocalPurgeBackend(LoggingPurgeBackend):
+    """Заглушка прокси для тестов: запоминает последние
+    LOCAL_PURGED_LIMIT сброшенных ключей."""
+    purged = deque(maxlen=LOCAL_PURGED_LIMIT)
+
+    def purge(self, keys):
+        self.purged.extend(keys)
+        super().purge(keys)
+
+
+class HttpPurgeBackend:
+    """Отправляет на EDGE_PURGE_URL запрос EDGE_PURGE_METHOD
+    (PURGE по умолчанию) с ключами в заголовке Surrogate-Key,
+    как ожидают Varnish с xkey и Fastly."""
+
+    def purge(self, keys):
+        requests.request(
+            getattr(settings, 'EDGE_PURGE_METHOD', 'PURGE'),
+            settings.EDGE_PURGE_URL,
+            headers={'Surrogate-Key': ' '.join(keys)},
+            timeout=PURGE_TIMEOUT
+        ).raise_for_status()
+
+
+def get_purge_backend():
+    return import_string(
+        getattr(settings, 'EDGE_PURGE_BACKEND', PURGE_BACKEND)
+    )()
+
+
+def send_purge(keys):
+    get_purge_backend().purge(keys)
+
+
+def purge(keys):
+    """Ставит в очередь задач сброс на прокси страниц с ключами
+    keys после фиксации транзакции. Ошибка прокси не ломает
+    запрос: задача повторяется, а страница в худшем случае
+    устареет сама через s-maxage."""
+    keys = sorted(set(keys))
+    if keys:
+        transaction.on_commit(
+            lambda: enqueue('core.edge.send_purge', keys)
+        )
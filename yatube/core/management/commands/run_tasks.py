@@ -0,0 +1,48 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core.tasks import (
+    BATCH_SIZE, KEEP_FINISHED, delete_finished, run_pending
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выполняет фоновые задачи из базы '
+        '(TASK_BACKEND = core.tasks.DatabaseBackend)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить задачи, время которых пришло, и завершиться'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько задач забирать из базы за раз'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=1,
+            help='Пауза в секундах, когда задач нет'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=KEEP_FINISHED.days,
+            help='Сколько дней хранить выполненные задачи'
+        )
+
+    def handle(self, *args, **options):
+        deleted = delete_finished(timedelta(days=options['keep_days']))
+        if deleted:
+            self.stdout.write(f'Удалено выполненных задач: {deleted}')
+        while True:
+            processed = run_pending(options['batch_size'])
+            if processed:
+                self.stdout.write(f'Выполнено задач: {processed}')
+            if options['once'] and processed < options['batch_size']:
+                break
+            if not processed:
+                close_old_connections()
+                time.sleep(options['sleep'])
@@ -0,0 +1,133 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .pagecache import fill_holes, page_cache_timeout, page_key
+from .routers import state
+
+PIN_COOKIE = 'db_pin'
+# Сколько секунд после записи читать из основной базы,
+# чтобы пользователь сразу видел свои изменения
+REPLICA_PIN_SECONDS = 10
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Заголовки, которые сохраняются вместе со страницей в кэше
+CACHED_HEADERS = (
+    'Content-Type', 'ETag', 'Last-Modified', 'Cache-Control', 'Surrogate-Key'
+)
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплики для view, помеченных
+    core.routers.use_replica. После записи закрепляет
+    пользователя за основной базой на REPLICA_PIN_SECONDS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state.use_replica = False
+        state.wrote = False
+        try:
+            response = self.get_response(request)
+            if state.wrote:
+                pin_seconds = getattr(
+                    settings, 'REPLICA_PIN_SECONDS', REPLICA_PIN_SECONDS
+                )
+                response.set_cookie(
+                    PIN_COOKIE,
+                    str(int(time.time()) + pin_seconds),
+                    max_age=pin_seconds,
+                    httponly=True
+                )
+            return response
+        finally:
+            state.use_replica = False
+            state.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state.use_replica = (
+            getattr(view_func, 'use_replica', False)
+            and request.method in SAFE_METHODS
+            and not self.is_pinned(request)
+        )
+
+    def is_pinned(self, request):
+        try:
+            return int(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдает анонимным посетителям страницы из кэша
+    без вызова view (см. core.pagecache).
+
+    Посетитель считается анонимным, если у него нет сессии,
+    флеш-сообщений и закрепления за основной базой:
+    это проверяется по cookies, без запросов к базе."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        key = getattr(request, '_page_cache_key', None)
+        if (
+            key
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        ):
+            cache.set(
+                key,
+                (
+                    response.content.decode(response.charset),
+                    {
+                        name: response[name]
+                        for name in CACHED_HEADERS if response.has_header(name)
+                    }
+                ),
+                page_cache_timeout()
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        keys = getattr(view_func, 'page_cache_keys', None)
+        if not (
+            keys
+            and request.method == 'GET'
+            and self.is_anonymous(request)
+        ):
+            return None
+        key = page_key(request, keys(request, *view_args, **view_kwargs))
+        cached = cache.get(key)
+        if cached is None:
+            request._page_cache_key = key
+            return None
+        content, headers = cached
+        response = HttpResponse()
+        for name, value in headers.items():
+            response[name] = value
+        conditional = get_conditional_response(
+            request,
+            etag=response.get('ETag'),
+            last_modified=parse_http_date_safe(
+                response.get('Last-Modified', '')
+            ),
+            response=response
+        )
+        if conditional is not response:
+            return conditional
+        response.content = fill_holes(content, request)
+        return response
+
+    def is_anonymous(self, request):
+        # 'messages' - cookie хранилища флеш-сообщений
+        return not any(
+            name in request.COOKIES
+            for name in (settings.SESSION_COOKIE_NAME, 'messages', PIN_COOKIE)
+        )
@@ -0,0 +1,84 @@
+"""Кэш целых страниц для анонимных посетителей.
+
+Страницы view, помеченных cache_anonymous_page, сохраняются
+в кэше по пути, строке запроса и версиям ключей страницы,
+и AnonymousPageCacheMiddleware отдает их, не вызывая view.
+invalidate_pages меняет версии ключей, и страницы с ними
+перестают читаться из кэша. Части страницы, которые зависят
+от пользователя, выводятся тегом {% page_hole %} и заново
+рисуются при каждой выдаче страницы из кэша."""
+import hashlib
+import re
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+PAGE_VERSION_PREFIX = 'core:page:version'
+PAGE_CACHE_TIMEOUT = 60 * 10
+HOLE_RE = re.compile(
+    r'<!--hole:(?P<name>[\w/.-]+)-->.*?<!--/hole:(?P=name)-->', re.S
+)
+
+
+def cache_anonymous_page(keys):
+    """Помечает view, страницы которого можно кэшировать
+    целиком для анонимных посетителей. keys(request, *args, **kwargs)
+    возвращает ключи страницы, как у core.edge.edge_cache."""
+    def decorator(view):
+        view.page_cache_keys = keys
+        return view
+    return decorator
+
+
+def page_cache_timeout():
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', PAGE_CACHE_TIMEOUT)
+
+
+def page_versions(keys):
+    """Версии ключей. Версия, которой нет в кэше (еще не задана
+    или вытеснена), создается заново, поэтому старые страницы
+    с этим ключом не читаются."""
+    names = [f'{PAGE_VERSION_PREFIX}:{key}' for key in keys]
+    versions = cache.get_many(names)
+    missing = {
+        name: uuid.uuid4().hex for name in names if name not in versions
+    }
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[name] for name in names]
+
+
+def page_key(request, keys):
+    versions = ':'.join(page_versions(keys))
+    digest = hashlib.md5(
+        f'{versions}:{request.get_full_path()}'.encode()
+    ).hexdigest()
+    return f'core:page:{digest}'
+
+
+def invalidate_pages(keys):
+    """Сбрасывает кэш страниц с любым из ключей keys."""
+    cache.set_many(
+        {f'{PAGE_VERSION_PREFIX}:{key}': uuid.uuid4().hex for key in keys},
+        None
+    )
+
+
+def render_hole(template_name, request):
+    """Рисует шаблон и обрамляет его метками,
+    по которым он заменяется в странице из кэша."""
+    return mark_safe(''.join((
+        f'<!--hole:{template_name}-->',
+        render_to_string(template_name, request=request),
+        f'<!--/hole:{template_name}-->',
+    )))
+
+
+def fill_holes(content, request):
+    return HOLE_RE.sub(
+        lambda match: render_hole(match['name'], request), content
+    )
@@ -0,0 +1,48 @@
+import threading
+
+from django.conf import settings
+
+REPLICA_DB = 'replica'
+# Служебные таблицы, которые всегда читаются из основной базы,
+# а запись в них не закрепляет пользователя за основной базой:
+# кэш (YATUBE_CACHE=db) пишется и при анонимных чтениях,
+# а версии кэша и сессии с реплики читались бы с отставанием
+PRIMARY_APPS = {'django_cache', 'sessions'}
+
+# Состояние текущего запроса: можно ли читать с реплики
+# и была ли в запросе запись в основную базу
+state = threading.local()
+
+
+def use_replica(view):
+    """Помечает view, которое можно обслуживать с реплики."""
+    view.use_replica = True
+    return view
+
+
+class ReplicaRouter:
+    """Направляет чтения помеченных view на реплику,
+    все записи и остальные чтения - в основную базу."""
+
+    def db_for_read(self, model, **hints):
+        # После записи в этом же запросе читаем из основной базы
+        if (
+            model._meta.app_label not in PRIMARY_APPS
+            and getattr(state, 'use_replica', False)
+            and not getattr(state, 'wrote', False)
+            and REPLICA_DB in settings.DATABASES
+        ):
+            return REPLICA_DB
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label not in PRIMARY_APPS:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DB
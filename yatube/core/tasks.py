@@ -0,0 +1,245 @@
+"""Очередь фоновых задач.
+
+Задача - функция, заданная строкой импорта, и ее аргументы,
+которые должны сохраняться в JSON. enqueue передает задачу
+бэкенду из настройки TASK_BACKEND:
+- ImmediateBackend выполняет задачу сразу в текущем процессе
+  один раз, для разработки и тестов;
+- ThreadBackend (по умолчанию) выполняет задачи в потоках
+  процесса после фиксации транзакции;
+- DatabaseBackend сохраняет задачи в таблицу core_task
+  в той же транзакции, что и изменение данных,
+  их выполняет команда run_tasks.
+Упавшая задача в ThreadBackend и DatabaseBackend повторяется
+до MAX_ATTEMPTS раз. Задача с уже использованным ключом
+идемпотентности повторно не ставится, если только она
+не упала: тогда она ставится заново."""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_BACKEND = 'core.tasks.ThreadBackend'
+MAX_ATTEMPTS = 5
+# Пауза перед повтором в DatabaseBackend, удваивается с каждой попыткой
+RETRY_DELAY = 10
+# Сколько секунд задача считается занятой воркером: если он
+# упал, задачу после этого заберет другой
+LOCK_TIMEOUT = 60 * 5
+BATCH_SIZE = 100
+WORKERS = 2
+# Сколько хранить выполненные задачи (и занятыми их ключи)
+KEEP_FINISHED = timedelta(days=7)
+# Как часто бэкенды без воркера run_tasks удаляют старые задачи
+CLEANUP_INTERVAL = 60 * 60
+CLEANUP_KEY = 'core:tasks:cleanup'
+
+
+def call(name, args=(), kwargs=None):
+    return import_string(name)(*args, **(kwargs or {}))
+
+
+def create_task(name, args, kwargs, key, status):
+    """Сохраняет задачу в таблицу. Если задача с ключом key
+    уже есть и не упала, возвращает None: ее повторно
+    не выполняем. Упавшая задача ставится заново."""
+    run_at = timezone.now()
+    if status == Task.RUNNING:
+        # Задачу выполняет процесс, а не run_pending:
+        # воркер заберет ее, только если процесс не отметил
+        # результат за LOCK_TIMEOUT
+        run_at += timedelta(seconds=LOCK_TIMEOUT)
+    fields = {
+        'name': name,
+        'arguments': json.dumps([list(args), kwargs]),
+        'status': status,
+        'run_at': run_at,
+    }
+    try:
+        with transaction.atomic():
+            return Task.objects.create(
+                idempotency_key=key, max_attempts=MAX_ATTEMPTS, **fields
+            )
+    except IntegrityError:
+        pass
+    retried = Task.objects.filter(
+        idempotency_key=key, status=Task.FAILED
+    ).update(attempts=0, last_error='', **fields)
+    if not retried:
+        return None
+    return Task.objects.get(idempotency_key=key)
+
+
+def cleanup_finished():
+    """Удаляет старые выполненные задачи не чаще раза
+    в CLEANUP_INTERVAL секунд. Нужна бэкендам, у которых
+    нет воркера run_tasks, удаляющего их."""
+    if cache.add(CLEANUP_KEY, 1, CLEANUP_INTERVAL):
+        delete_finished(KEEP_FINISHED)
+
+
+def running_task(name, args, kwargs, key):
+    """Запись выполняемой в процессе задачи с ключом
+    идемпотентности, в которой отмечается результат.
+    Если задача с ключом key уже была и не упала,
+    возвращает None."""
+    cleanup_finished()
+    return create_task(name, args, kwargs, key, Task.RUNNING)
+
+
+def run_with_retries(name, args, kwargs, task_id=None,
+                     max_attempts=MAX_ATTEMPTS):
+    """Выполняет задачу в процессе, повторяя ее при ошибке.
+    Каждая попытка идет в своей точке сохранения, чтобы ошибка
+    задачи не ломала транзакцию запроса. task_id - запись
+    с ключом идемпотентности, в которой отмечается результат."""
+    for attempt in range(1, max_attempts + 1):
+        try:
+            with transaction.atomic():
+                call(name, args, kwargs)
+        except Exception as error:
+            logger.exception(
+                'Задача %s упала, попытка %s из %s',
+                name, attempt, max_attempts
+            )
+            last_error = repr(error)
+        else:
+            if task_id is not None:
+                Task.objects.filter(id=task_id).update(
+                    status=Task.DONE, attempts=attempt
+                )
+            return True
+    if task_id is not None:
+        Task.objects.filter(id=task_id).update(
+            status=Task.FAILED, attempts=max_attempts, last_error=last_error
+        )
+    return False
+
+
+class ImmediateBackend:
+    """Выполняет задачу сразу и один раз: повторы подряд
+    задержали бы запрос, например, на время ожидания
+    недоступного прокси. Упавшая задача выполнится снова,
+    когда ее поставят с тем же ключом. Ключи идемпотентности
+    хранятся в той же таблице, что и у DatabaseBackend."""
+
+    def enqueue(self, name, args, kwargs, key):
+        task_id = None
+        if key is not None:
+            task = running_task(name, args, kwargs, key)
+            if task is None:
+                return
+            task_id = task.id
+        run_with_retries(name, args, kwargs, task_id, max_attempts=1)
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=WORKERS, thread_name_prefix='tasks'
+        )
+    return _executor
+
+
+def _run_in_worker(name, args, kwargs, task_id):
+    close_old_connections()
+    try:
+        run_with_retries(name, args, kwargs, task_id)
+    finally:
+        close_old_connections()
+
+
+class ThreadBackend:
+    """Выполняет задачи в потоках процесса после фиксации
+    транзакции. Задачи теряются, если процесс остановится
+    раньше, чем они выполнятся."""
+
+    def enqueue(self, name, args, kwargs, key):
+        task_id = None
+        if key is not None:
+            task = running_task(name, args, kwargs, key)
+            if task is None:
+                return
+            task_id = task.id
+        transaction.on_commit(lambda: get_executor().submit(
+            _run_in_worker, name, args, kwargs, task_id
+        ))
+
+
+class DatabaseBackend:
+    def enqueue(self, name, args, kwargs, key):
+        create_task(name, args, kwargs, key, Task.PENDING)
+
+
+def get_backend():
+    return import_string(getattr(settings, 'TASK_BACKEND', TASK_BACKEND))()
+
+
+def enqueue(name, *args, key=None, **kwargs):
+    """Ставит в очередь вызов функции name(*args, **kwargs).
+    key - ключ идемпотентности: задача с уже известным ключом
+    не ставится повторно."""
+    get_backend().enqueue(name, args, kwargs, key)
+
+
+def run_pending(limit=BATCH_SIZE):
+    """Выполняет задачи DatabaseBackend, время которых пришло.
+    Возвращает количество выполненных попыток."""
+    now = timezone.now()
+    due = Task.objects.filter(
+        status__in=(Task.PENDING, Task.RUNNING), run_at__lte=now
+    ).order_by('run_at', 'id')[:limit]
+    processed = 0
+    for task in due:
+        # Забираем задачу, только если ее не забрал другой воркер
+        claimed = Task.objects.filter(
+            id=task.id, status=task.status, run_at=task.run_at
+        ).update(
+            status=Task.RUNNING,
+            run_at=now + timedelta(seconds=LOCK_TIMEOUT),
+            attempts=F('attempts') + 1
+        )
+        if not claimed:
+            continue
+        processed += 1
+        attempts = task.attempts + 1
+        args, kwargs = json.loads(task.arguments)
+        try:
+            with transaction.atomic():
+                call(task.name, args, kwargs)
+        except Exception as error:
+            logger.exception('Задача %s упала', task.name)
+            failed = attempts >= task.max_attempts
+            Task.objects.filter(id=task.id).update(
+                status=Task.FAILED if failed else Task.PENDING,
+                run_at=timezone.now() + timedelta(
+                    seconds=RETRY_DELAY * 2 ** (attempts - 1)
+                ),
+                last_error=repr(error)
+            )
+        else:
+            Task.objects.filter(id=task.id).update(status=Task.DONE)
+    return processed
+
+
+def delete_finished(older_than):
+    """Удаляет выполненные задачи старше older_than (timedelta).
+    Их ключи идемпотентности после этого снова свободны."""
+    return Task.objects.filter(
+        status=Task.DONE, created__lt=timezone.now() - older_than
+    ).delete()[0]
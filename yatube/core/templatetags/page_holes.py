@@ -0,0 +1,12 @@
+from django import template
+
+from core.pagecache import render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_hole(context, template_name):
+    """Часть страницы, которая не попадает в кэш страниц:
+    при выдаче страницы из кэша шаблон рисуется заново."""
+    return render_hole(template_name, context['request'])
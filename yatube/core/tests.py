@@ -1,6 +1,37 @@
+from datetime import timedelta
 from http import HTTPStatus
+from io import StringIO
 
-from django.test import TestCase, Client
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory
+from django.core.management import call_command
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Comment, Follow, Group, Post
+
+from .edge import LOCAL_PURGED_LIMIT, LocalPurgeBackend
+from .middleware import PIN_COOKIE
+from .models import Task
+from .tasks import KEEP_FINISHED, MAX_ATTEMPTS, enqueue, run_pending
+from .pagecache import fill_holes
+from .routers import REPLICA_DB, ReplicaRouter, state
+
+User = get_user_model()
+# Вызовы тестовых задач
+calls = []
+
+
+def record_task(value, fail=0):
+    """Тестовая задача: падает первые fail раз."""
+    calls.append(value)
+    if calls.count(value) <= fail:
+        raise ValueError(value)
 
 
 class ViewTestClass(TestCase):
@@ -14,3 +45,321 @@ class ViewTestClass(TestCase):
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         # Проверьте, что используется шаблон core/404.html
         self.assertTemplateUsed(response, 'core/404.html')
+
+    def test_cache_health(self):
+        response = self.guest_client.get(reverse('cache_health'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['cache'], 'ok')
+
+    def test_cache_health_unavailable(self):
+        with mock.patch(
+            'core.views.cache.set', side_effect=ConnectionError
+        ):
+            response = self.guest_client.get(reverse('cache_health'))
+        self.assertEqual(
+            response.status_code, HTTPStatus.SERVICE_UNAVAILABLE
+        )
+
+
+class ReplicaRouterTest(TestCase):
+    def setUp(self) -> None:
+        cache.clear()
+        self.guest_client = Client()
+        self.user = User.objects.create_user(username='auth')
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.router = ReplicaRouter()
+        self.replica = mock.patch.dict(
+            settings.DATABASES, {REPLICA_DB: settings.DATABASES['default']}
+        )
+
+    def tearDown(self) -> None:
+        state.use_replica = False
+        state.wrote = False
+
+    def get_read_db(self, client, url):
+        """Возвращает базу, из которой читались данные во время view."""
+        used = []
+        original = ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            used.append(original(router, model, **hints))
+            return 'default'
+
+        with self.replica, mock.patch.object(
+            ReplicaRouter, 'db_for_read', db_for_read
+        ):
+            client.get(url)
+        return set(used)
+
+    def test_read_views_use_replica(self):
+        """Страницы с постами читают данные с реплики."""
+        self.assertEqual(
+            self.get_read_db(self.guest_client, reverse('posts:index')),
+            {REPLICA_DB}
+        )
+
+    def test_write_pins_client_to_primary(self):
+        """После записи пользователь читает из основной базы."""
+        author = User.objects.create_user(username='author')
+        response = self.authorized_client.get(
+            reverse('posts:profile_follow', args=(author.username,))
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(
+            self.get_read_db(
+                self.authorized_client,
+                reverse('posts:profile', args=(author.username,))
+            ),
+            {'default'}
+        )
+
+    def test_database_cache_uses_primary(self):
+        """Таблица кэша читается из основной базы, а запись в кэш
+        при анонимном чтении не закрепляет посетителя за ней."""
+        db_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'test_cache',
+        }}
+        with self.settings(CACHES=db_cache):
+            call_command('createcachetable', verbosity=0)
+            cache_model = cache.cache_model_class
+            with self.replica:
+                state.use_replica, state.wrote = True, False
+                self.assertEqual(
+                    self.router.db_for_read(cache_model), 'default'
+                )
+                self.assertEqual(self.router.db_for_read(Post), REPLICA_DB)
+            response = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_router_without_replica(self):
+        """Без настроенной реплики все чтения идут в основную базу."""
+        state.use_replica = True
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.url = reverse('posts:index')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_page_is_served_without_view(self):
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertTemplateNotUsed(response, 'posts/index.html')
+        self.assertContains(response, 'Пост')
+        self.assertContains(response, 'Войти')
+
+    def test_changes_invalidate_cached_pages(self):
+        self.client.get(self.url)
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        self.assertIsNotNone(self.client.get(self.url).context)
+
+    def test_pages_are_invalidated_by_their_keys(self):
+        """Изменение сбрасывает только страницы со своими ключами,
+        подписки страниц анонимных посетителей не меняют."""
+        group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        pages = {
+            self.url: 'posts/index.html',
+            reverse('posts:group_list', args=(group.slug,)):
+                'posts/group_list.html',
+            reverse('posts:profile', args=(self.user.username,)):
+                'posts/profile.html',
+        }
+        for url in pages:
+            self.client.get(url)
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=other, author=self.user)
+        Post.objects.create(author=other, text='Чужой пост')
+        for url, template in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                if url == self.url:
+                    self.assertTemplateUsed(response, template)
+                else:
+                    self.assertTemplateNotUsed(response, template)
+        group = Group.objects.get(id=group.id)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(
+            self.client.get(reverse('posts:group_list', args=('group',))),
+            'Новое название'
+        )
+
+    def test_logged_in_user_is_not_served_from_cache(self):
+        self.client.get(self.url)
+        self.client.force_login(self.user)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Выйти')
+
+    def test_holes_are_rendered_for_each_request(self):
+        request = RequestFactory().get(self.url)
+        request.user = self.user
+        content = fill_holes(
+            'до <!--hole:includes/user_menu.html-->Войти'
+            '<!--/hole:includes/user_menu.html--> после',
+            request
+        )
+        self.assertIn('Пользователь: auth', content)
+        self.assertNotIn('Войти', content)
+        self.assertTrue(content.endswith(' после'))
+
+
+@override_settings(EDGE_PURGE_BACKEND='core.edge.LocalPurgeBackend')
+@mock.patch('core.edge.transaction.on_commit', lambda send: send())
+class EdgeCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        LocalPurgeBackend.purged.clear()
+
+    def test_pages_have_cache_headers_and_keys(self):
+        pages = {
+            reverse('posts:index'): 'index',
+            reverse('posts:group_list', args=('group',)): 'group:group',
+            reverse('posts:profile', args=('auth',)): 'author:auth',
+            reverse('posts:post_detail', args=(self.post.id,)):
+                f'post:{self.post.id}',
+        }
+        for url, key in pages.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage', response['Cache-Control'])
+                self.assertEqual(response['Surrogate-Key'], key)
+                # Та же страница из кэша страниц
+                self.assertEqual(
+                    self.client.get(url)['Cache-Control'],
+                    response['Cache-Control']
+                )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('private', response['Cache-Control'])
+        self.assertNotIn('Surrogate-Key', response)
+
+    def test_changes_purge_keys(self):
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:post_edit', args=(self.post.id,)),
+            {'text': 'Новый текст'}
+        )
+        self.assertEqual(
+            set(LocalPurgeBackend.purged),
+            {'index', f'post:{self.post.id}', 'author:auth', 'group:group'}
+        )
+        LocalPurgeBackend.purged.clear()
+        self.client.post(
+            reverse('posts:add_comment', args=(self.post.id,)),
+            {'text': 'Комментарий'}
+        )
+        # Пост после правки остался без группы
+        self.assertEqual(
+            set(LocalPurgeBackend.purged),
+            {'index', f'post:{self.post.id}', 'author:auth'}
+        )
+        LocalPurgeBackend.purged.clear()
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+        self.assertEqual(list(LocalPurgeBackend.purged), ['author:author'])
+
+    def test_local_backend_keeps_last_keys(self):
+        """Заглушка прокси хранит ограниченное число ключей."""
+        backend = LocalPurgeBackend()
+        backend.purge(
+            [f'post:{i}' for i in range(LOCAL_PURGED_LIMIT + 1)]
+        )
+        self.assertEqual(len(backend.purged), LOCAL_PURGED_LIMIT)
+        self.assertEqual(
+            backend.purged[-1], f'post:{LOCAL_PURGED_LIMIT}'
+        )
+
+
+class TaskQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_immediate_backend_deduplicates(self):
+        enqueue('core.tests.record_task', 'a', key='a')
+        enqueue('core.tests.record_task', 'a', key='a')
+        self.assertEqual(calls, ['a'])
+        self.assertEqual(Task.objects.get(idempotency_key='a').status, 'done')
+
+    def test_immediate_backend_does_not_retry(self):
+        """Упавшая задача не повторяется подряд внутри запроса."""
+        with self.assertLogs('core.tasks', 'ERROR'):
+            enqueue('core.tests.record_task', 'b', fail=MAX_ATTEMPTS, key='b')
+        self.assertEqual(calls, ['b'])
+        self.assertEqual(
+            Task.objects.get(idempotency_key='b').status, 'failed'
+        )
+
+    def test_failed_task_runs_again(self):
+        """Упавшую задачу можно поставить с тем же ключом снова."""
+        with self.assertLogs('core.tasks', 'ERROR'):
+            enqueue('core.tests.record_task', 'e', fail=1, key='e')
+        enqueue('core.tests.record_task', 'e', key='e')
+        self.assertEqual(calls, ['e', 'e'])
+        task = Task.objects.get(idempotency_key='e')
+        self.assertEqual((task.status, task.attempts), ('done', 1))
+
+    @override_settings(TASK_BACKEND='core.tasks.ThreadBackend')
+    def test_thread_task_is_not_run_by_worker(self):
+        """Задачу, которую выполняет процесс, воркер
+        не забирает до истечения блокировки."""
+        with mock.patch('core.tasks.transaction.on_commit'):
+            enqueue('core.tests.record_task', 'f', key='f')
+        self.assertEqual(Task.objects.get().status, 'running')
+        self.assertEqual(run_pending(), 0)
+        self.assertEqual(calls, [])
+
+    def test_immediate_backend_deletes_old_tasks(self):
+        cache.clear()
+        old = Task.objects.create(
+            name='core.tests.record_task', arguments='[[], {}]',
+            idempotency_key='old', status=Task.DONE
+        )
+        Task.objects.filter(id=old.id).update(
+            created=timezone.now() - KEEP_FINISHED - timedelta(days=1)
+        )
+        enqueue('core.tests.record_task', 'd', key='d')
+        self.assertEqual(
+            list(Task.objects.values_list('idempotency_key', flat=True)),
+            ['d']
+        )
+
+    @override_settings(TASK_BACKEND='core.tasks.DatabaseBackend')
+    def test_database_backend(self):
+        """Задачи выполняет воркер, упавшая задача
+        откладывается и повторяется позже."""
+        enqueue('core.tests.record_task', 'c', fail=1, key='c')
+        enqueue('core.tests.record_task', 'c', key='c')
+        self.assertEqual(calls, [])
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        task = Task.objects.get()
+        self.assertEqual((task.status, task.attempts), ('pending', 1))
+        self.assertEqual(run_pending(), 0)
+        Task.objects.update(run_at=task.created)
+        call_command('run_tasks', '--once', stdout=StringIO())
+        self.assertEqual(calls, ['c', 'c'])
+        self.assertEqual(Task.objects.get().status, 'done')
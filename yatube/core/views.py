@@ -1,3 +1,7 @@
+import uuid
+
+from django.core.cache import cache
+from django.http import JsonResponse
 from django.shortcuts import render
 
 
@@ -17,3 +21,21 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def cache_health(request):
+    """Проверяет, что кэш доступен на запись и чтение."""
+    key = f'health:{uuid.uuid4().hex}'
+    try:
+        cache.set(key, 'ok', 10)
+        healthy = cache.get(key) == 'ok'
+        cache.delete(key)
+    except Exception:
+        healthy = False
+    return JsonResponse(
+        {
+            'cache': 'ok' if healthy else 'unavailable',
+            'backend': cache.__class__.__name__,
+        },
+        status=200 if healthy else 503
+    )
@@ -1,6 +1,8 @@
 from django.contrib import admin
 
 from .models import Post, Group
+from .search import search_posts
+from .utils import EstimatedCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,16 +14,43 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    # Автора и группу получаем одним запросом со списком постов
+    list_select_related = ('author', 'group')
     # Добавляем возможность редактировать содержимое поля group
     # прямо в списке объектов Post
     list_editable = ('group',)
-    # Добавляем интерфейс для поиска по тексту постов
+    # Добавляем интерфейс для поиска по тексту постов,
+    # сам поиск идет по полнотекстовому индексу (см. get_search_results)
     search_fields = ('text',)
-    # Добавляем возможность фильтрации по дате
+    # Добавляем возможность фильтрации по дате.
+    # Фильтр сравнивает pub_date с границами диапазона,
+    # поэтому работает по индексу. date_hierarchy не используем:
+    # список лет строится через DISTINCT по всей таблице постов
     list_filter = ('pub_date',)
+    # Количество постов без фильтров оцениваем, а не считаем
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     # Отображаем текст -пусто-, если какое-то поле не заполнено
     empty_value_display = '-пусто-'
 
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Список групп для list_editable запрашиваем один раз
+            # на страницу, а не для каждой строки
+            choices = getattr(request, '_group_choices', None)
+            if choices is None:
+                choices = request._group_choices = list(iter(field.choices))
+            field.choices = choices
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return queryset, False
+        found = search_posts(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
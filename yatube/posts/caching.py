@@ -0,0 +1,28 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+# Главная страница кэшируется надолго: кэш сбрасывается
+# сменой версии при любом изменении постов
+INDEX_CACHE_TIMEOUT = 60 * 60 * 3
+INDEX_VERSION_KEY = 'posts:index:version'
+
+
+def get_version(key):
+    """Текущая версия кэшированных данных."""
+    return cache.get_or_set(key, 1, None)
+
+
+def get_modified(key):
+    """Время последней смены версии. Если его нет в кэше,
+    считаем, что данные изменились сейчас."""
+    return cache.get_or_set(f'{key}:modified', timezone.now, None)
+
+
+def bump_version(key):
+    """Меняет версию, после чего старые записи кэша
+    больше не читаются и вытесняются по таймауту."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 2, None)
+    cache.set(f'{key}:modified', timezone.now(), None)
@@ -0,0 +1,110 @@
+"""Условные GET-запросы (ETag и Last-Modified) для страниц постов.
+
+Страница отвечает 304 без обращения к шаблонам, если с прошлого
+визита не появилось новых постов и комментариев и посты не
+редактировались. Работает только для анонимных посетителей:
+у вошедших в страницу входят CSRF-токен и кнопки подписки,
+которые не отражены во времени изменения."""
+import hashlib
+
+from django.db.models import Count, OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from .caching import INDEX_VERSION_KEY, get_modified
+from .models import Comment, Post
+
+
+def conditional_page(last_modified_func):
+    """Декоратор condition(), в котором ETag и Last-Modified
+    считаются по одному вызову last_modified_func. Функция
+    возвращает время изменения страницы или пару
+    (время изменения, значение для ETag)."""
+    def page_state(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return None
+        if not hasattr(request, '_page_state'):
+            state = last_modified_func(*args, **kwargs)
+            if state is not None and not isinstance(state, tuple):
+                state = state, state.isoformat()
+            request._page_state = state
+        return request._page_state
+
+    def last_modified(request, *args, **kwargs):
+        state = page_state(request, *args, **kwargs)
+        return state and state[0]
+
+    def etag(request, *args, **kwargs):
+        state = page_state(request, *args, **kwargs)
+        if state is None:
+            return None
+        return hashlib.md5(
+            f'{request.get_full_path()}:{state[1]}'.encode()
+        ).hexdigest()
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
+
+
+def listing_modified(posts):
+    """Время изменения списка постов: новейший пост списка
+    и комментарий (оба берутся по индексу), а также последняя
+    правка или удаление любого поста или комментария
+    (время смены версии INDEX_VERSION_KEY)."""
+    newest_post = posts.order_by('-pub_date', '-id').values_list(
+        'pub_date', flat=True
+    ).first()
+    newest_comment = Comment.objects.order_by('-id').values_list(
+        'created', flat=True
+    ).first()
+    return max(filter(None, (
+        newest_post, newest_comment, get_modified(INDEX_VERSION_KEY)
+    )))
+
+
+def index_modified():
+    return listing_modified(Post.objects.all())
+
+
+def group_modified(slug):
+    return listing_modified(Post.objects.filter(group__slug=slug))
+
+
+def profile_modified(username):
+    return listing_modified(Post.objects.filter(author__username=username))
+
+
+def post_modified(post_id):
+    """Время изменения страницы поста и значение для ETag.
+
+    На странице выводятся комментарии и количество постов автора.
+    Удаление комментария или пост автора не меняют время правки
+    поста, поэтому в ETag входят количество комментариев,
+    id последнего из них и счетчик постов автора.
+    Last-Modified дополнительно учитывает смену версии
+    INDEX_VERSION_KEY (меняется при изменении любых постов
+    и комментариев) для клиентов, которые присылают только
+    If-Modified-Since.
+    Для несуществующего поста None — тогда view отдаст 404."""
+    comments = Comment.objects.filter(post=OuterRef('pk'))
+    row = Post.objects.filter(id=post_id).annotate(
+        last_comment=Subquery(
+            comments.order_by('-created', '-id').values('created')[:1]
+        ),
+        last_comment_id=Subquery(comments.order_by('-id').values('id')[:1]),
+        comment_count=Subquery(
+            comments.order_by().values('post').annotate(
+                total=Count('id')
+            ).values('total')
+        ),
+    ).values_list(
+        'updated', 'last_comment', 'last_comment_id', 'comment_count',
+        'author__counter__post_count'
+    ).first()
+    if row is None:
+        return None
+    updated, last_comment, *counters = row
+    modified = max(filter(None, (
+        updated, last_comment, get_modified(INDEX_VERSION_KEY)
+    )))
+    return modified, ':'.join(
+        str(value) for value in (updated.isoformat(), *counters)
+    )
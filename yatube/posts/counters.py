@@ -0,0 +1,56 @@
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import AuthorCounter, Group, User
+
+
+def changed(field, delta):
+    """Новое значение счетчика. Счетчик не уходит ниже нуля, даже
+    если разошелся с данными (посты, созданные через bulk_create
+    или update, сигналы не обновляют), иначе удаление поста
+    нарушило бы ограничение положительного поля."""
+    return Greatest(F(field) + delta, 0)
+
+
+def change_author_count(author_id, delta, field='post_count'):
+    """Изменяет счетчик автора (постов или подписчиков) на delta."""
+    updated = AuthorCounter.objects.filter(author_id=author_id).update(
+        **{field: changed(field, delta)}
+    )
+    if not updated and delta > 0:
+        AuthorCounter.objects.get_or_create(
+            author_id=author_id, defaults={field: delta}
+        )
+
+
+def change_group_count(group_id, delta):
+    """Изменяет счетчик постов группы на delta."""
+    if group_id is not None:
+        Group.objects.filter(id=group_id).update(
+            post_count=changed('post_count', delta)
+        )
+
+
+def recount_posts():
+    """Пересчитывает счетчики постов и подписчиков всех авторов
+    и счетчики постов групп.
+    Возвращает количество обновленных авторов и групп."""
+    authors = User.objects.annotate(
+        total=Count('posts', distinct=True),
+        followers=Count('following', distinct=True)
+    ).values_list('id', 'total', 'followers')
+    authors_updated = 0
+    for author_id, total, followers in authors.iterator():
+        AuthorCounter.objects.update_or_create(
+            author_id=author_id,
+            defaults={'post_count': total, 'follower_count': followers}
+        )
+        authors_updated += 1
+    groups = Group.objects.annotate(total=Count('posts'))
+    groups_updated = 0
+    for group in groups.iterator():
+        if group.post_count != group.total:
+            group.post_count = group.total
+            group.save(update_fields=('post_count',))
+        groups_updated += 1
+    return authors_updated, groups_updated
@@ -0,0 +1,136 @@
+from django.conf import settings
+from django.db.models import F, Q
+
+from .models import AuthorCounter, FeedEntry, Follow, Post
+
+# Посты авторов, у которых подписчиков больше этого числа,
+# не раскладываются по лентам при публикации,
+# а подмешиваются в ленту при чтении
+FANOUT_FOLLOWER_LIMIT = 10000
+# Сколько последних постов автора добавлять в ленту при подписке
+BACKFILL_LIMIT = 1000
+BATCH_SIZE = 500
+# Ключ KeysetPaginator для ленты, совпадающий с индексом ленты
+FEED_KEYSET_KEY = ('feed_pub_date', 'feed_post')
+
+
+def fanout_follower_limit():
+    return getattr(
+        settings, 'POSTS_FANOUT_FOLLOWER_LIMIT', FANOUT_FOLLOWER_LIMIT
+    )
+
+
+def on_demand(prefix=''):
+    """Условие для авторов, посты которых читаются при открытии ленты:
+    подписчиков больше лимита сейчас или было раньше."""
+    return (
+        Q(**{f'{prefix}follower_count__gt': fanout_follower_limit()})
+        | Q(**{f'{prefix}read_on_demand': True})
+    )
+
+
+def remember_popular(author_id):
+    """Запоминает, что у автора подписчиков больше лимита.
+    Флаг не снимается: посты, опубликованные в это время,
+    не разложены по лентам, а подписки не получили старых постов."""
+    AuthorCounter.objects.filter(
+        author_id=author_id,
+        follower_count__gt=fanout_follower_limit(),
+        read_on_demand=False
+    ).update(read_on_demand=True)
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли посты автора по лентам подписчиков."""
+    return not AuthorCounter.objects.filter(
+        on_demand(), author_id=author_id
+    ).exists()
+
+
+def fan_out_post(post):
+    """Добавляет новый пост в ленты подписчиков автора."""
+    if not is_fanout_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post.id,
+                author_id=post.author_id,
+                pub_date=post.pub_date
+            )
+            for user_id in followers.iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def backfill_feed(user_id, author_id):
+    """Добавляет в ленту пользователя последние посты автора,
+    на которого он подписался."""
+    if not is_fanout_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        (
+            FeedEntry(
+                user_id=user_id,
+                post_id=post_id,
+                author_id=author_id,
+                pub_date=pub_date
+            )
+            for post_id, pub_date in posts
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True
+    )
+
+
+def prune_feed(user_id, author_id):
+    """Убирает из ленты пользователя посты автора, от которого он
+    отписался."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def _feed(user):
+    """Посты ленты без аннотаций и признак того,
+    что лента целиком материализована."""
+    popular_authors = Follow.objects.filter(
+        on_demand('author__counter__'), user=user
+    ).values('author_id')
+    if not popular_authors.exists():
+        return Post.objects.filter(feed_entries__user=user), True
+    entries = FeedEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(id__in=entries) | Q(author_id__in=popular_authors)
+    ), False
+
+
+def feed_posts(user):
+    """Посты ленты подписок пользователя.
+
+    Обычно это одно чтение по индексу ленты. Посты авторов
+    с большим количеством подписчиков берутся напрямую
+    из таблицы постов. Порядок ленты задают аннотации
+    FEED_KEYSET_KEY."""
+    feed, materialized = _feed(user)
+    if materialized:
+        feed = feed.annotate(
+            feed_pub_date=F('feed_entries__pub_date'),
+            feed_post=F('feed_entries__post')
+        )
+    else:
+        feed = feed.annotate(feed_pub_date=F('pub_date'), feed_post=F('id'))
+    return feed.order_by('-feed_pub_date', '-feed_post')
+
+
+def feed_size(user):
+    """Запрос для подсчета постов ленты без аннотаций,
+    иначе COUNT(*) выполняется по подзапросу."""
+    return _feed(user)[0]
@@ -1,7 +1,70 @@
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
 from django.forms import ModelForm
+from PIL import Image, ImageOps
 
 from .models import Post, Comment
 
+# Ограничения для загружаемых картинок, переопределяются в settings
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_MAX_DIMENSION = 2560
+IMAGE_QUALITY = 85
+LOSSY_FORMATS = ('JPEG', 'MPO', 'WEBP')
+
+
+def image_setting(name, default):
+    return getattr(settings, f'POSTS_{name}', default)
+
+
+def normalize_image(upload):
+    """Приводит загруженную картинку к допустимому виду:
+    поворачивает по EXIF и удаляет EXIF, уменьшает до
+    IMAGE_MAX_DIMENSION и пережимает с качеством IMAGE_QUALITY.
+    Картинки, которым это не нужно, возвращаются без изменений."""
+    if upload.size > image_setting('IMAGE_MAX_UPLOAD_SIZE',
+                                   IMAGE_MAX_UPLOAD_SIZE):
+        raise ValidationError(
+            'Файл слишком большой', code='file_too_large'
+        )
+    upload.seek(0)
+    # Image.open читает только заголовок, поэтому размер
+    # проверяется до распаковки картинки в память
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > image_setting('IMAGE_MAX_PIXELS', IMAGE_MAX_PIXELS):
+        raise ValidationError(
+            'Слишком большое разрешение картинки', code='too_many_pixels'
+        )
+    image_format = image.format
+    max_dimension = image_setting('IMAGE_MAX_DIMENSION', IMAGE_MAX_DIMENSION)
+    oversized = max(width, height) > max_dimension
+    if not (oversized or image.getexif() or image_format in LOSSY_FORMATS):
+        upload.seek(0)
+        return upload
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_dimension, max_dimension))
+    if image_format in LOSSY_FORMATS and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = BytesIO()
+    image.save(
+        output,
+        format='JPEG' if image_format == 'MPO' else image_format,
+        quality=image_setting('IMAGE_QUALITY', IMAGE_QUALITY),
+        optimize=True
+    )
+    return InMemoryUploadedFile(
+        output,
+        field_name=upload.field_name,
+        name=upload.name,
+        content_type=upload.content_type,
+        size=output.tell(),
+        charset=None
+    )
+
 
 class PostForm(ModelForm):
     class Meta:
@@ -16,6 +79,13 @@ class PostForm(ModelForm):
             'image': 'Картинка'
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Уже сохраненную картинку при редактировании не трогаем
+        if isinstance(image, UploadedFile):
+            return normalize_image(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
@@ -0,0 +1,87 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts.models import Post
+from posts.storage import post_image_storage, walk
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки постов, на которые не ссылается ни один пост, '
+        'и миниатюры, о которых не знает sorl'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько файлов проверять в базе за раз'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены'
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        originals = self.clean_originals()
+        if not self.dry_run:
+            # Убираем из хранилища sorl ссылки на удаленные файлы
+            default.kvstore.cleanup()
+        thumbnails = self.clean_thumbnails()
+        action = 'Будут удалены' if self.dry_run else 'Удалены'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} картинки: {originals}, миниатюры: {thumbnails}'
+        ))
+
+    def clean_originals(self):
+        upload_to = Post._meta.get_field('image').upload_to
+        removed = 0
+        batch = []
+        for name in walk(post_image_storage, upload_to.rstrip('/')):
+            batch.append(name)
+            if len(batch) >= self.batch_size:
+                removed += self.remove_unused(batch)
+                batch = []
+        if batch:
+            removed += self.remove_unused(batch)
+        return removed
+
+    def remove_unused(self, names):
+        used = set(
+            Post.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        )
+        removed = 0
+        for name in names:
+            if name in used:
+                continue
+            removed += 1
+            self.stdout.write(f'Картинка без поста: {name}')
+            if not self.dry_run:
+                delete_with_thumbnails(ImageFile(name, post_image_storage))
+        self.stdout.write(f'Проверено файлов: {len(names)}')
+        return removed
+
+    def clean_thumbnails(self):
+        kvstore = default.kvstore
+        known = set()
+        for key in kvstore._find_keys(identity='image'):
+            image_file = kvstore._get(key)
+            if image_file:
+                known.add(image_file.name)
+        storage = default.storage
+        removed = 0
+        prefix = thumbnail_settings.THUMBNAIL_PREFIX.rstrip('/')
+        for name in walk(storage, prefix):
+            if name in known:
+                continue
+            removed += 1
+            self.stdout.write(f'Миниатюра без картинки: {name}')
+            if not self.dry_run:
+                storage.delete(name)
+        return removed
@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails
+
+
+def init_worker():
+    # При запуске процесса через spawn Django нужно настроить заново
+    django.setup()
+
+
+def warm(image_name):
+    try:
+        generate_thumbnails(image_name)
+        return image_name, None
+    except Exception as error:
+        return image_name, error
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создает миниатюры картинок всех постов, например '
+        'после изменения размеров в posts.thumbnails.RENDITIONS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько картинок читать из базы за раз'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Количество процессов (по умолчанию - число ядер)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько картинок будет обработано'
+        )
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').order_by(
+            'image'
+        ).values_list('image', flat=True).distinct()
+        total = images.count()
+        if options['dry_run']:
+            self.stdout.write(f'Будут обработаны картинки: {total}')
+            return
+        # Процессы не должны наследовать открытые соединения с базой
+        connections.close_all()
+        done = failed = 0
+        batch_size = options['batch_size']
+        with ProcessPoolExecutor(
+            max_workers=options['workers'], initializer=init_worker
+        ) as executor:
+            # Пакеты выбираются по ключу (image > последней картинки),
+            # а не через OFFSET, который перебирает все предыдущие строки
+            batch = list(images[:batch_size])
+            while batch:
+                for image_name, error in executor.map(warm, batch):
+                    done += 1
+                    if error is not None:
+                        failed += 1
+                        self.stderr.write(f'{image_name}: {error}')
+                self.stdout.write(f'Обработано {done} из {total}')
+                batch = list(
+                    images.filter(image__gt=batch[-1])[:batch_size]
+                )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {done - failed}, ошибок: {failed}'
+        ))
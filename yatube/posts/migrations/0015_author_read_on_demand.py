@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorcounter',
+            name='read_on_demand',
+            field=models.BooleanField(default=False, verbose_name='Посты читаются при открытии ленты'),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth import get_user_model
 
+from .storage import post_image_storage
+
 User = get_user_model()
 
 
@@ -12,10 +14,53 @@ class Group(models.Model):
         verbose_name='Идентификатор'
     )
     description = models.TextField()
+    # Поддерживается сигналами posts.signals,
+    # пересчитывается командой recount_posts
+    post_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
 
     def __str__(self) -> str:
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем slug, чтобы при его смене сбросить
+        # страницу группы по прежнему адресу
+        instance._loaded_slug = instance.__dict__.get('slug')
+        return instance
+
+
+class AuthorCounter(models.Model):
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='counter',
+        verbose_name='Автор'
+    )
+    post_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0
+    )
+    follower_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0
+    )
+    # Автор хотя бы раз превышал FANOUT_FOLLOWER_LIMIT: его посты
+    # читаются при открытии ленты и после того, как подписчиков
+    # стало меньше, иначе из лент пропали бы не разложенные посты
+    read_on_demand = models.BooleanField(
+        'Посты читаются при открытии ленты',
+        default=False
+    )
+
+    class Meta:
+        verbose_name = 'Счетчик автора'
+        verbose_name_plural = 'Счетчики авторов'
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -26,6 +71,12 @@ class Post(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    # Меняется при каждом сохранении,
+    # служит версией закэшированной разметки поста
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -44,14 +95,42 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=post_image_storage,
+        blank=True,
+        db_index=True
     )
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем группу, чтобы при сохранении
+        # перенести пост в счетчике новой группы,
+        instance._loaded_group_id = instance.__dict__.get('group_id')
+        # и картинку, чтобы освободить прежний файл
+        instance._loaded_image = instance.__dict__.get('image')
+        return instance
+
     class Meta:
         ordering = ['-pub_date']
+        # Индексы под ленты: все посты, посты группы и автора,
+        # упорядоченные по дате (см. KeysetPaginator)
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='posts_post_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='posts_post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='posts_post_author_date_idx'
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
@@ -81,6 +160,12 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='posts_comment_post_date_idx'
+            ),
+        ]
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
 
@@ -100,5 +185,51 @@ class Follow(models.Model):
     )
 
     class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='posts_follow_unique'
+            ),
+        ]
         verbose_name = 'Подписка'
         verbose_name_plural = "Подписки"
+
+
+class FeedEntry(models.Model):
+    """Пост в ленте подписок пользователя.
+    Заполняется при публикации поста (posts.feed)."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='posts_feed_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='posts_feed_user_author_idx'
+            ),
+        ]
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
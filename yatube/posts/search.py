@@ -0,0 +1,94 @@
+"""Полнотекстовый поиск по постам.
+
+В PostgreSQL текст разбирается через to_tsvector с русской
+конфигурацией, выражение покрыто GIN-индексом
+(см. миграцию 0014_post_search). В SQLite поиск идет по
+виртуальной таблице FTS5, куда пишутся основы слов:
+русского стеммера в SQLite нет, поэтому слова
+приводятся к основам на стороне Python (posts.stemmer)."""
+from django.db import connection
+
+from .models import Post
+from .stemmer import stem_text
+
+FTS_TABLE = 'posts_post_fts'
+SEARCH_CONFIG = 'russian'
+BATCH_SIZE = 500
+
+
+def uses_fts_table():
+    return connection.vendor == 'sqlite'
+
+
+def index_post(post):
+    """Добавляет пост в индекс или обновляет его запись."""
+    if not uses_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {FTS_TABLE} (rowid, text) '
+            'VALUES (%s, %s)',
+            [post.pk, ' '.join(stem_text(post.text))]
+        )
+
+
+def unindex_post(post_id):
+    if not uses_fts_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [post_id]
+        )
+
+
+def rebuild_index():
+    """Заново строит индекс по всем постам, например после
+    массового QuerySet.update(), который не вызывает сигналы.
+    Возвращает количество проиндексированных постов."""
+    if not uses_fts_table():
+        return Post.objects.count()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+    total = 0
+    posts = Post.objects.order_by('id').values_list('id', 'text')
+    last_id = 0
+    while True:
+        batch = list(posts.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            return total
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, text) VALUES (%s, %s)',
+                [(pk, ' '.join(stem_text(text))) for pk, text in batch]
+            )
+        total += len(batch)
+        last_id = batch[-1][0]
+
+
+def search_posts(query):
+    """Посты, подходящие под запрос, от наиболее релевантных.
+    При одинаковой релевантности сначала идут новые."""
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import (
+            SearchQuery, SearchRank, SearchVector
+        )
+        vector = SearchVector('text', config=SEARCH_CONFIG)
+        search_query = SearchQuery(query, config=SEARCH_CONFIG)
+        return Post.objects.annotate(
+            search=vector, rank=SearchRank(vector, search_query)
+        ).filter(search=search_query).order_by('-rank', '-pub_date', '-id')
+    if not uses_fts_table():
+        return Post.objects.filter(text__icontains=query)
+    terms = stem_text(query)
+    if not terms:
+        return Post.objects.none()
+    # Основы состоят только из букв и цифр, но каждую берем
+    # в кавычки, чтобы FTS5 не принял ее за оператор (AND, NOT...)
+    match = ' '.join(f'"{term}"' for term in terms)
+    return Post.objects.extra(
+        tables=[FTS_TABLE],
+        where=[f'{FTS_TABLE}.rowid = posts_post.id', f'{FTS_TABLE} MATCH %s'],
+        params=[match],
+        select={'rank': f'bm25({FTS_TABLE})'},
+        order_by=['rank', '-pub_date', '-id'],
+    )
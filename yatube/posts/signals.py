@@ -0,0 +1,149 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.edge import purge
+from core.pagecache import invalidate_pages
+from core.tasks import enqueue
+
+from .caching import INDEX_VERSION_KEY, bump_version
+from .counters import change_author_count, change_group_count
+from .feed import remember_popular
+from .models import Comment, Follow, Group, Post, User
+from .storage import release_image
+
+
+def author_key(author_id):
+    username = User.objects.filter(id=author_id).values_list(
+        'username', flat=True
+    ).first()
+    return [f'author:{username}'] if username else []
+
+
+def reset_pages(keys):
+    """Сбрасывает страницы с ключами keys на прокси
+    и в кэше страниц анонимных посетителей."""
+    purge(keys)
+    invalidate_pages(keys)
+
+
+# Объявлен раньше update_counters_on_save: тот обновляет
+# _loaded_group_id, а здесь нужна прежняя группа поста
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def purge_post_pages(sender, instance, **kwargs):
+    """Сбрасывает пост, его автора и группы
+    (прежнюю и новую) и главную страницу."""
+    group_ids = {
+        instance.group_id, getattr(instance, '_loaded_group_id', None)
+    }
+    slugs = Group.objects.filter(id__in=group_ids - {None}).values_list(
+        'slug', flat=True
+    )
+    reset_pages(
+        ['index', f'post:{instance.pk}']
+        + author_key(instance.author_id)
+        + [f'group:{slug}' for slug in slugs]
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def purge_comment_post(sender, instance, **kwargs):
+    """Сбрасывает пост и списки, в которых выводится
+    количество его комментариев."""
+    post = Post.objects.filter(id=instance.post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    keys = [f'post:{instance.post_id}']
+    if post is not None:
+        username, slug = post
+        keys += ['index', f'author:{username}']
+        if slug:
+            keys.append(f'group:{slug}')
+    reset_pages(keys)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def purge_group_pages(sender, instance, **kwargs):
+    """Сбрасывает страницу группы, в том числе по прежнему slug."""
+    slugs = {instance.slug, getattr(instance, '_loaded_slug', None)}
+    reset_pages([f'group:{slug}' for slug in sorted(slugs - {None})])
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def purge_followed_author(sender, instance, **kwargs):
+    purge(author_key(instance.author_id))
+
+
+@receiver(post_save, sender=Post)
+def update_counters_on_save(sender, instance, created, **kwargs):
+    """Поддерживает счетчики постов при создании поста
+    и при переносе его в другую группу,
+    ставит в очередь раскладку нового поста по лентам подписчиков,
+    освобождает замененную картинку."""
+    if created:
+        change_author_count(instance.author_id, 1)
+        change_group_count(instance.group_id, 1)
+        enqueue(
+            'posts.tasks.fan_out', instance.id,
+            key=f'posts:fan_out:{instance.id}'
+        )
+    else:
+        old_group_id = getattr(instance, '_loaded_group_id', None)
+        if old_group_id != instance.group_id:
+            change_group_count(old_group_id, -1)
+            change_group_count(instance.group_id, 1)
+    instance._loaded_group_id = instance.group_id
+    old_image = getattr(instance, '_loaded_image', None)
+    if old_image and str(old_image) != instance.image.name:
+        release_image(str(old_image))
+    instance._loaded_image = instance.image.name
+    bump_version(INDEX_VERSION_KEY)
+
+
+@receiver(post_delete, sender=Post)
+def update_counters_on_delete(sender, instance, **kwargs):
+    change_author_count(instance.author_id, -1)
+    change_group_count(instance.group_id, -1)
+    release_image(instance.image.name)
+    bump_version(INDEX_VERSION_KEY)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_index_on_comment(sender, **kwargs):
+    """В ленте главной страницы выводится количество
+    комментариев поста, поэтому кэш ленты сбрасывается."""
+    bump_version(INDEX_VERSION_KEY)
+
+
+@receiver(post_save, sender=Post)
+def update_search_index_on_save(sender, instance, **kwargs):
+    enqueue('posts.tasks.reindex', instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def update_search_index_on_delete(sender, instance, **kwargs):
+    enqueue('posts.tasks.reindex', instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def update_feed_on_follow(sender, instance, created, **kwargs):
+    if created:
+        change_author_count(instance.author_id, 1, 'follower_count')
+        remember_popular(instance.author_id)
+        enqueue(
+            'posts.tasks.backfill', instance.user_id, instance.author_id,
+            key=f'posts:backfill:{instance.id}'
+        )
+
+
+@receiver(post_delete, sender=Follow)
+def update_feed_on_unfollow(sender, instance, **kwargs):
+    change_author_count(instance.author_id, -1, 'follower_count')
+    enqueue(
+        'posts.tasks.prune', instance.user_id, instance.author_id,
+        key=f'posts:prune:{instance.id}'
+    )
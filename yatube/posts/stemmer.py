@@ -0,0 +1,120 @@
+"""Стеммер русского языка (алгоритм Snowball/Портера).
+
+Используется для полнотекстового поиска в SQLite, где нет
+встроенной поддержки русской морфологии."""
+import re
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+REFLEXIVE = ('ся', 'сь')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+VERB = (
+    (
+        'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+        'ет', 'ют', 'ны', 'ть', 'ешь', 'нно',
+    ),
+    (
+        'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+        'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+        'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+    ),
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+    'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+    'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+    'ья', 'я',
+)
+SUPERLATIVE = ('ейш', 'ейше')
+DERIVATIONAL = ('ост', 'ость')
+WORD_RE = re.compile(r'\w+')
+
+
+def _region(word):
+    """Позиция, с которой начинается часть слова после
+    первого сочетания гласной и согласной."""
+    for i in range(1, len(word)):
+        if word[i - 1] in VOWELS and word[i] not in VOWELS:
+            return i + 1
+    return len(word)
+
+
+def _strip(word, endings, start=0):
+    """Отрезает самое длинное окончание из endings,
+    не заходя левее start. Возвращает None, если окончания нет."""
+    for ending in sorted(endings, key=len, reverse=True):
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            return word[:-len(ending)]
+    return None
+
+
+def _strip_groups(word, groups, start):
+    """Окончания первой группы отрезаются, только если
+    перед ними стоит «а» или «я»."""
+    first, second = groups
+    for ending in sorted(first + second, key=len, reverse=True):
+        if not word.endswith(ending) or len(word) - len(ending) < start:
+            continue
+        stem = word[:-len(ending)]
+        if ending in second:
+            return stem
+        if stem and stem[-1] in 'ая' and len(stem) - 1 >= start:
+            return stem
+    return None
+
+
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv = next(
+        (i + 1 for i, letter in enumerate(word) if letter in VOWELS),
+        len(word)
+    )
+    r1 = _region(word)
+    r2 = r1 + _region(word[r1:])
+
+    # Шаг 1: деепричастия, затем возвратные частицы
+    # и окончания прилагательных, глаголов или существительных
+    stripped = _strip_groups(word, PERFECTIVE_GERUND, rv)
+    if stripped is not None:
+        word = stripped
+    else:
+        word = _strip(word, REFLEXIVE, rv) or word
+        stripped = _strip(word, ADJECTIVE, rv)
+        if stripped is not None:
+            word = _strip_groups(stripped, PARTICIPLE, rv) or stripped
+        else:
+            word = (
+                _strip_groups(word, VERB, rv)
+                or _strip(word, NOUN, rv)
+                or word
+            )
+    # Шаг 2
+    word = _strip(word, ('и',), rv) or word
+    # Шаг 3: словообразующие суффиксы в R2
+    word = _strip(word, DERIVATIONAL, r2) or word
+    # Шаг 4
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        return word[:-1]
+    stripped = _strip(word, SUPERLATIVE, rv)
+    if stripped is not None:
+        word = stripped
+        if word.endswith('нн'):
+            word = word[:-1]
+        return word
+    return _strip(word, ('ь',), rv) or word
+
+
+def stem_text(text):
+    """Список основ всех слов текста."""
+    return [stem(word) for word in WORD_RE.findall(text)]
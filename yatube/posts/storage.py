@@ -0,0 +1,66 @@
+import hashlib
+import logging
+import posixpath
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from sorl.thumbnail import delete as delete_with_thumbnails
+from sorl.thumbnail.images import ImageFile
+
+logger = logging.getLogger(__name__)
+
+
+class ContentHashStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла - хэш его содержимого.
+
+    Одинаковые картинки хранятся один раз, а sorl находит
+    для них уже готовые миниатюры, так как ключ миниатюры
+    строится по имени файла."""
+
+    def save(self, name, content, max_length=None):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = posixpath.splitext(filename)[1].lower()
+        digest = digest.hexdigest()
+        name = posixpath.join(directory, digest[:2], f'{digest}{extension}')
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+
+post_image_storage = ContentHashStorage()
+
+
+def walk(storage, path):
+    """Перебирает имена всех файлов хранилища внутри path."""
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield posixpath.join(path, filename)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+def release_image(name):
+    """Удаляет файл картинки и его миниатюры, если на него
+    больше не ссылается ни один пост. Количество ссылок
+    считается по таблице постов (поле image проиндексировано)."""
+    from .models import Post
+
+    if not name:
+        return
+
+    def delete_unused():
+        if Post.objects.filter(image=name).exists():
+            return
+        try:
+            delete_with_thumbnails(ImageFile(name, post_image_storage))
+        except Exception:
+            logger.exception('Не удалось удалить картинку %s', name)
+
+    transaction.on_commit(delete_unused)
@@ -0,0 +1,43 @@
+"""Фоновые задачи постов (см. core.tasks).
+
+Задачи получают id, а не объекты, и проверяют, что данные
+еще актуальны: между постановкой и выполнением пост могут
+удалить, а подписку - отменить."""
+from sorl.thumbnail import get_thumbnail
+
+from .feed import backfill_feed, fan_out_post, prune_feed
+from .models import Follow, Post
+from .search import index_post, unindex_post
+from .thumbnails import source_image
+
+
+def fan_out(post_id):
+    post = Post.objects.filter(id=post_id).first()
+    if post is not None:
+        fan_out_post(post)
+
+
+def backfill(user_id, author_id):
+    if Follow.objects.filter(user_id=user_id, author_id=author_id).exists():
+        backfill_feed(user_id, author_id)
+
+
+def prune(user_id, author_id):
+    if not Follow.objects.filter(
+        user_id=user_id, author_id=author_id
+    ).exists():
+        prune_feed(user_id, author_id)
+
+
+def reindex(post_id):
+    post = Post.objects.filter(id=post_id).first()
+    if post is None:
+        unindex_post(post_id)
+    else:
+        index_post(post)
+
+
+def thumbnail(image_name, geometry, options):
+    # Картинку могли удалить вместе с последним постом
+    if Post.objects.filter(image=image_name).exists():
+        get_thumbnail(source_image(image_name), geometry, **options)
@@ -0,0 +1,41 @@
+import logging
+
+from django import template
+from django.conf import settings
+from sorl.thumbnail import get_thumbnail
+
+from posts.thumbnails import FALLBACK_RENDITION, rendition_options
+
+logger = logging.getLogger(__name__)
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(image, css_class=''):
+    """Выводит картинку поста с вариантами разных размеров
+    в srcset и WebP-вариантами для браузеров, которые его понимают."""
+    if not image:
+        return {'image': None}
+    srcset, webp_srcset, fallback = [], [], None
+    try:
+        for name, geometry, options in rendition_options():
+            thumbnail = get_thumbnail(image, geometry, **options)
+            candidate = f'{thumbnail.url} {thumbnail.width}w'
+            if name.endswith('_webp'):
+                webp_srcset.append(candidate)
+            else:
+                srcset.append(candidate)
+            if name == FALLBACK_RENDITION:
+                fallback = thumbnail
+    except Exception:
+        # Как и тег thumbnail, не ломаем страницу из-за картинки
+        if settings.DEBUG and getattr(settings, 'THUMBNAIL_DEBUG', False):
+            raise
+        logger.exception('Не удалось создать миниатюры для %s', image)
+        return {'image': None}
+    return {
+        'image': fallback,
+        'srcset': ', '.join(srcset),
+        'webp_srcset': ', '.join(webp_srcset),
+        'css_class': css_class,
+    }
@@ -0,0 +1,50 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.admin, group=cls.group, text=f'Пост {i}')
+            for i in range(5)
+        )
+        cls.cats = Post.objects.create(
+            author=cls.admin, text='Кошки ловят мышей'
+        )
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Автор и группа не запрашиваются отдельно для каждой строки."""
+        self.client.get(self.url)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.context['cl'].result_list), 6)
+
+    def test_changelist_does_not_scan_dates(self):
+        """Список постов не перебирает даты всех постов
+        (как date_hierarchy через DISTINCT)."""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        self.assertFalse(
+            [query for query in queries if 'DISTINCT' in query['sql']]
+        )
+
+    def test_search_uses_word_forms(self):
+        response = self.client.get(self.url, {'q': 'кошка'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.cats]
+        )
@@ -0,0 +1,111 @@
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from ..models import Post, User
+from ..storage import post_image_storage
+from ..templatetags.post_images import post_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class SerialExecutor:
+    """Выполняет задачи в текущем процессе вместо ProcessPoolExecutor:
+    процессы не видят тестовую базу."""
+
+    def __init__(self, max_workers, initializer):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def map(self, function, items):
+        return map(function, items)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaCommandsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls) -> None:
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self) -> None:
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile(
+                name='small.gif', content=SMALL_GIF, content_type='image/gif'
+            )
+        )
+
+    def test_warm_thumbnails(self):
+        """warm_thumbnails обходит все картинки пакетами и создает
+        миниатюры, которые потом находит тег post_image."""
+        other = Post.objects.create(
+            author=self.user,
+            text='Другой пост',
+            image=SimpleUploadedFile(
+                name='other.gif', content=SMALL_GIF + b'other',
+                content_type='image/gif'
+            )
+        )
+        with mock.patch(
+            'posts.management.commands.warm_thumbnails.ProcessPoolExecutor',
+            SerialExecutor
+        ):
+            out = StringIO()
+            call_command('warm_thumbnails', '--batch-size', '1', stdout=out)
+        self.assertIn('Готово: 2, ошибок: 0', out.getvalue())
+        with mock.patch(
+            'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail'
+        ) as create:
+            for post in (self.post, other):
+                context = post_image(Post.objects.get(id=post.id).image)
+                self.assertIsNotNone(context['image'])
+        create.assert_not_called()
+
+    def test_warm_thumbnails_dry_run(self):
+        with mock.patch(
+            'posts.management.commands.warm_thumbnails.generate_thumbnails'
+        ) as generate:
+            out = StringIO()
+            call_command('warm_thumbnails', '--dry-run', stdout=out)
+        generate.assert_not_called()
+        self.assertIn('1', out.getvalue())
+
+    def test_clean_media(self):
+        """clean_media удаляет только файлы, не связанные с постами."""
+        orphan = post_image_storage.save(
+            'posts/orphan.gif', ContentFile(SMALL_GIF + b'orphan')
+        )
+        orphan_thumbnail = default_storage.save(
+            'cache/00/00/orphan.jpg', ContentFile(b'thumbnail')
+        )
+        call_command('clean_media', '--dry-run', stdout=StringIO())
+        self.assertTrue(post_image_storage.exists(orphan))
+        self.assertTrue(default_storage.exists(orphan_thumbnail))
+        call_command('clean_media', stdout=StringIO())
+        self.assertFalse(post_image_storage.exists(orphan))
+        self.assertFalse(default_storage.exists(orphan_thumbnail))
+        self.assertTrue(post_image_storage.exists(self.post.image.name))
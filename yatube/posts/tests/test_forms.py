@@ -1,13 +1,24 @@
 # posts/tests/test_forms.py
+import hashlib
 import tempfile
 import shutil
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
 
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 
+from core.tasks import run_pending
+
 from ..models import Post, Group, User
+from ..templatetags.post_images import post_image
+from ..thumbnails import (
+    generate_thumbnails, rendition_options, schedule_thumbnails
+)
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -85,13 +96,124 @@ class PostCreateFormTest(TestCase):
         # Проверяем, увеличилось ли число постов
         self.assertEqual(Post.objects.count(), posts_count + 1)
         # Проверяем, что создалась запись с заданным текстом и группой
-        self.assertTrue(
-            Post.objects.filter(
-                text='test_text',
-                group_id=self.group.id,
-                image=f'posts/{self.uploaded.name}'
-            ).exists()
+        post = Post.objects.get(text='test_text', group_id=self.group.id)
+        # Картинка хранится под именем, построенным по ее содержимому
+        digest = hashlib.sha256(self.small_gif).hexdigest()
+        self.assertEqual(post.image.name, f'posts/{digest[:2]}/{digest}.gif')
+
+    def test_create_post_schedules_thumbnails(self):
+        """Проверяет, что после создания поста с картинкой
+        миниатюры ставятся в очередь и создаются заранее."""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=self.small_gif,
+            content_type='image/gif'
+        )
+        with mock.patch('posts.views.schedule_thumbnails') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'thumb_text', 'image': uploaded}
+            )
+        post = Post.objects.get(text='thumb_text')
+        schedule.assert_called_once_with(post)
+        with mock.patch('posts.thumbnails.get_thumbnail') as get_thumbnail:
+            generate_thumbnails(post.image)
+        get_thumbnail.assert_any_call(
+            post.image, '960x339', crop='center', upscale=True
+        )
+        self.assertEqual(
+            get_thumbnail.call_count, len(list(rendition_options()))
+        )
+
+    def test_page_uses_thumbnails_from_worker(self):
+        """Тег post_image находит миниатюры, созданные фоновыми
+        задачами по имени картинки, и не создает их заново."""
+        post = Post.objects.create(
+            author=self.user, text='worker', image=self.get_jpeg(
+                'worker.jpg', (100, 50)
+            )
         )
+        with override_settings(TASK_BACKEND='core.tasks.DatabaseBackend'):
+            schedule_thumbnails(post)
+        self.assertEqual(run_pending(), len(list(rendition_options())))
+        with mock.patch(
+            'sorl.thumbnail.base.ThumbnailBackend._create_thumbnail'
+        ) as create:
+            context = post_image(Post.objects.get(id=post.id).image)
+        create.assert_not_called()
+        self.assertIsNotNone(context['image'])
+
+    def get_jpeg(self, name, size, exif=None):
+        output = BytesIO()
+        image = Image.new('RGB', size, color=(255, 0, 0))
+        if exif is not None:
+            image.save(output, 'JPEG', exif=exif)
+        else:
+            image.save(output, 'JPEG')
+        return SimpleUploadedFile(
+            name=name, content=output.getvalue(), content_type='image/jpeg'
+        )
+
+    @override_settings(POSTS_IMAGE_MAX_DIMENSION=100)
+    def test_create_post_normalizes_image(self):
+        """Проверяет, что большая картинка уменьшается,
+        а EXIF удаляется перед сохранением."""
+        exif = Image.Exif()
+        exif[0x010F] = 'Camera'
+        uploaded = self.get_jpeg('camera.jpg', (400, 200), exif.tobytes())
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'camera_text', 'image': uploaded}
+        )
+        post = Post.objects.get(text='camera_text')
+        with Image.open(post.image) as image:
+            self.assertEqual(image.size, (100, 50))
+            self.assertFalse(image.getexif())
+
+    def test_create_post_rejects_huge_images(self):
+        """Проверяет, что слишком большие картинки не сохраняются."""
+        limits = (
+            {'POSTS_IMAGE_MAX_PIXELS': 100},
+            {'POSTS_IMAGE_MAX_UPLOAD_SIZE': 10},
+        )
+        for limit in limits:
+            with self.subTest(limit=limit), override_settings(**limit):
+                response = self.authorized_client.post(
+                    reverse('posts:post_create'),
+                    data={
+                        'text': 'huge_text',
+                        'image': self.get_jpeg('huge.jpg', (20, 20))
+                    }
+                )
+                self.assertTrue(response.context['form'].errors['image'])
+                self.assertFalse(
+                    Post.objects.filter(text='huge_text').exists()
+                )
+
+    def test_same_image_is_stored_once(self):
+        """Проверяет, что одинаковые картинки хранятся одним файлом,
+        который удаляется вместе с последним ссылающимся постом."""
+        posts = [
+            Post.objects.create(
+                author=self.user,
+                text=f'same_image_{i}',
+                image=SimpleUploadedFile(
+                    name=f'copy_{i}.gif',
+                    content=self.small_gif,
+                    content_type='image/gif'
+                )
+            )
+            for i in range(2)
+        ]
+        name = posts[0].image.name
+        self.assertEqual(posts[1].image.name, name)
+        storage = posts[0].image.storage
+        with mock.patch('posts.storage.transaction.on_commit',
+                        lambda callback: callback()):
+            posts[0].delete()
+            self.assertTrue(storage.exists(name))
+            posts[1].delete()
+            self.assertFalse(storage.exists(name))
 
     def test_post_edit(self):
         """Проверяет, что при отправке валидной формы со страницы
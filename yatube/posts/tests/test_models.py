@@ -1,6 +1,9 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Post, Group, User
+from ..models import AuthorCounter, Post, Group, User
 
 
 class PostModelTest(TestCase):
@@ -58,3 +61,58 @@ class PostModelTest(TestCase):
             with self.subTest(field=field):
                 self.assertEqual(
                     post._meta.get_field(field).help_text, expected_value)
+
+
+class PostCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.group_1 = Group.objects.create(
+            title='Группа 1', slug='group_1', description='Описание 1'
+        )
+
+    def assertCounts(self, author, group, group_1):
+        self.user.counter.refresh_from_db()
+        self.group.refresh_from_db()
+        self.group_1.refresh_from_db()
+        self.assertEqual(self.user.counter.post_count, author)
+        self.assertEqual(self.group.post_count, group)
+        self.assertEqual(self.group_1.post_count, group_1)
+
+    def test_counters_follow_post_changes(self):
+        """Счетчики постов меняются при создании, переносе
+        в другую группу и удалении поста."""
+        post = Post.objects.create(
+            author=self.user, text='Пост', group=self.group
+        )
+        Post.objects.create(author=self.user, text='Пост без группы')
+        self.assertCounts(2, 1, 0)
+        post = Post.objects.get(id=post.id)
+        post.group = self.group_1
+        post.save()
+        self.assertCounts(2, 0, 1)
+        post.delete()
+        self.assertCounts(1, 0, 0)
+
+    def test_drifted_counters_do_not_go_negative(self):
+        """Удаление постов, созданных без сигналов, не ломается
+        на ограничении положительного счетчика."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Без сигналов', group=self.group)
+        ])
+        for post in Post.objects.all():
+            post.delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_recount_posts_command(self):
+        """Команда recount_posts восстанавливает счетчики."""
+        Post.objects.create(author=self.user, text='Пост', group=self.group)
+        AuthorCounter.objects.all().delete()
+        Group.objects.update(post_count=5)
+        call_command('recount_posts', stdout=StringIO())
+        self.user.counter = AuthorCounter.objects.get(author=self.user)
+        self.assertCounts(1, 1, 0)
@@ -1,4 +1,7 @@
+from django.core.cache import cache
+from django.db import connection
 from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from ..models import Group, Post, User
@@ -40,6 +43,8 @@ class PaginatorViewsTest(TestCase):
         )
 
     def setUp(self) -> None:
+        # Общее количество постов кэшируется, очищаем его
+        cache.clear()
         # Создаем авторизованный клиент
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -63,3 +68,57 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     POST_AMOUNT - VIEW_ELEMENTS
                 )
+
+    def test_cursor_pages_contain_correct_amount_of_posts(self):
+        """Проверяет, что паджинатор по курсору отдает следующую
+        и предыдущую страницы по ссылкам из page_obj."""
+        for reverse_name in self.check_pages:
+            with self.subTest(reverse_name=reverse_name):
+                response = self.authorized_client.get(reverse_name)
+                first_page = response.context['page_obj']
+                self.assertTrue(first_page.has_next())
+                self.assertFalse(first_page.has_previous())
+                response = self.authorized_client.get(
+                    reverse_name,
+                    {'cursor': first_page.paginator.next_cursor}
+                )
+                second_page = response.context['page_obj']
+                self.assertEqual(
+                    len(second_page), POST_AMOUNT - VIEW_ELEMENTS
+                )
+                self.assertFalse(second_page.has_next())
+                response = self.authorized_client.get(
+                    reverse_name,
+                    {'cursor': second_page.paginator.previous_cursor}
+                )
+                self.assertEqual(
+                    list(response.context['page_obj']), list(first_page)
+                )
+
+    def test_cursor_page_does_not_count_posts(self):
+        """Проверяет, что паджинатор по курсору не выполняет COUNT(*)."""
+        response = self.authorized_client.get(self.REVERSE_INDEX)
+        paginator = response.context['page_obj'].paginator
+        with self.assertNumQueries(0):
+            paginator.num_pages
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверяет, что поддельный курсор ведет на первую страницу."""
+        response = self.authorized_client.get(
+            self.REVERSE_INDEX, {'cursor': 'broken'}
+        )
+        self.assertEqual(len(response.context['page_obj']), VIEW_ELEMENTS)
+
+    def test_second_page_uses_cached_count(self):
+        """Проверяет, что обычный паджинатор не выполняет COUNT(*),
+        если количество постов уже есть в кэше."""
+        for reverse_name in self.check_pages:
+            with self.subTest(reverse_name=reverse_name):
+                self.authorized_client.get(reverse_name + '?page=2')
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(reverse_name + '?page=2')
+                for query in queries:
+                    self.assertFalse(
+                        query['sql'].startswith('SELECT COUNT('),
+                        query['sql']
+                    )
@@ -0,0 +1,124 @@
+"""Бюджеты запросов и времени ответа основных страниц.
+
+Данные создаются в объемах, близких к рабочим: тысячи постов,
+комментариев и подписок. Тест падает, если изменение добавило
+запросы к базе или заметно замедлило страницу.
+Запустить только их: python manage.py test --tag performance,
+пропустить: python manage.py test --exclude-tag performance."""
+import random
+import time
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from mixer.backend.django import mixer
+
+from ..counters import recount_posts
+from ..models import Comment, Follow, Group, Post, User
+
+AUTHORS = 300
+POSTS = 3000
+COMMENTS = 3000
+# Комментарии к одному посту, который открывается в post_detail
+POST_COMMENTS = 500
+FOLLOWS = 3000
+READER_FOLLOWS = 50
+# Сколько раз открывать страницу: в бюджет идет лучший результат,
+# чтобы случайная задержка машины не роняла тест
+ATTEMPTS = 3
+# Бюджеты по страницам: (запросов к базе, секунд на ответ)
+# при пустом кэше и вошедшем пользователе
+BUDGETS = {
+    'posts:index': (3, 0.5),
+    'posts:group_list': (4, 0.5),
+    'posts:profile': (5, 0.5),
+    'posts:post_detail': (4, 0.5),
+    'posts:follow_index': (5, 0.5),
+}
+
+
+@tag('performance')
+class PageBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        cls.groups = mixer.cycle(5).blend(Group)
+        User.objects.bulk_create(
+            User(username=f'author{i}') for i in range(AUTHORS)
+        )
+        authors = list(User.objects.filter(username__startswith='author'))
+        Post.objects.bulk_create(
+            Post(
+                author=rng.choice(authors),
+                group=rng.choice(cls.groups + [None]),
+                text=f'Пост номер {i}'
+            )
+            for i in range(POSTS)
+        )
+        posts = list(Post.objects.values_list('id', flat=True))
+        cls.post = Post.objects.get(id=posts[-1])
+        Comment.objects.bulk_create(
+            Comment(
+                post_id=rng.choice(posts),
+                author=rng.choice(authors),
+                text='Комментарий'
+            )
+            for _ in range(COMMENTS)
+        )
+        Comment.objects.bulk_create(
+            Comment(post=cls.post, author=rng.choice(authors), text='Да')
+            for _ in range(POST_COMMENTS)
+        )
+        pairs = {
+            tuple(rng.sample(authors, 2)) for _ in range(FOLLOWS)
+        }
+        Follow.objects.bulk_create(
+            Follow(user=user, author=author) for user, author in pairs
+        )
+        cls.user = mixer.blend(User)
+        # Подписки читателя создаются по одной,
+        # чтобы сигналы заполнили его ленту
+        for author in rng.sample(authors, READER_FOLLOWS):
+            Follow.objects.create(user=cls.user, author=author)
+        recount_posts()
+        cls.author = cls.post.author
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def measure(self, url):
+        """Лучшее время ответа и количество запросов
+        при пустом кэше."""
+        best = None
+        for _ in range(ATTEMPTS):
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = self.client.get(url)
+                elapsed = time.perf_counter() - started
+            self.assertEqual(response.status_code, 200)
+            best = elapsed if best is None else min(best, elapsed)
+        return len(queries), best
+
+    def test_pages_fit_budget(self):
+        urls = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', args=(self.groups[0].slug,)
+            ),
+            'posts:profile': reverse(
+                'posts:profile', args=(self.author.username,)
+            ),
+            'posts:post_detail': reverse(
+                'posts:post_detail', args=(self.post.id,)
+            ),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        for name, url in urls.items():
+            max_queries, max_seconds = BUDGETS[name]
+            with self.subTest(page=name):
+                queries, seconds = self.measure(url)
+                self.assertLessEqual(queries, max_queries)
+                self.assertLessEqual(seconds, max_seconds)
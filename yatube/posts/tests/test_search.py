@@ -0,0 +1,69 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import search_posts
+from ..stemmer import stem
+
+
+class StemmerTest(TestCase):
+    def test_word_forms_have_same_stem(self):
+        for forms in (
+            ('кошка', 'кошки', 'кошками', 'кошкой'),
+            ('пост', 'посты', 'постов', 'постами'),
+            ('ёлка', 'елки'),
+        ):
+            with self.subTest(forms=forms):
+                self.assertEqual(len({stem(word) for word in forms}), 1)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошки ловят мышей, кошки спят'
+        )
+        cls.dog = Post.objects.create(
+            author=cls.user, text='Собака гуляет с кошкой'
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про погоду')
+
+    def test_search_finds_word_forms_by_rank(self):
+        """Поиск находит другие формы слова, самый
+        подходящий пост идет первым."""
+        self.assertEqual(
+            list(search_posts('кошка')), [self.cats, self.dog]
+        )
+
+    def test_index_follows_edit_and_delete(self):
+        post = Post.objects.get(pk=self.other.pk)
+        post.text = 'Кошачья погода, кошку не выгнать'
+        post.save()
+        self.assertIn(self.other, search_posts('кошку'))
+        Post.objects.get(pk=self.cats.pk).delete()
+        self.assertNotIn(self.cats, search_posts('кошки'))
+
+    def test_operators_in_query_are_words(self):
+        self.assertFalse(search_posts('NOT OR "('))
+        self.assertFalse(search_posts('   '))
+
+    def test_rebuild_index(self):
+        Post.objects.filter(pk=self.other.pk).update(text='Снег и кошки')
+        self.assertNotIn(self.other, search_posts('снег'))
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertIn(self.other, search_posts('снег'))
+
+    def test_search_page(self):
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'кошки'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [self.cats, self.dog]
+        )
+        self.assertEqual(response.context['query'], 'кошки')
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(len(response.context['page_obj']), 0)
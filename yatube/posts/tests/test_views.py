@@ -1,14 +1,20 @@
 import tempfile
 import shutil
+from unittest import mock
 
 from django.test import TestCase, Client, override_settings
 from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Post, Group, Follow, User
+from core.tasks import run_pending
+
+from ..models import Comment, FeedEntry, Post, Group, Follow, User
 from ..forms import PostForm
+from ..views import VIEW_ELEMENTS
 
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -209,6 +215,14 @@ class PostPagesTest(TestCase):
         response = self.guest_client.get(self.REVERSE_POST_DETAIL)
         self.assertEqual(response.context['post'].image, self.post.image)
 
+    def test_image_has_responsive_variants(self):
+        """Картинка поста выводится с вариантами размеров в srcset."""
+        for reverse_name in (self.REVERSE_POST_DETAIL, self.REVERSE_PROFILE):
+            with self.subTest(reverse_name=reverse_name):
+                response = self.guest_client.get(reverse_name)
+                self.assertContains(response, 'srcset=')
+                self.assertContains(response, '<picture>')
+
     def test_cache_on_index_page(self):
         """Проверяет работу кэш на странице index.html."""
         post_cache = Post.objects.create(
@@ -217,14 +231,61 @@ class PostPagesTest(TestCase):
         )
         response = self.guest_client.get(self.REVERSE_INDEX)
         response_content = response.content
-        Post.objects.get(id=post_cache.id).delete()
+        # Изменение в обход моделей не сбрасывает кэш
+        Post.objects.filter(id=post_cache.id).update(text='test_changed')
         cache_data = self.guest_client.get(self.REVERSE_INDEX)
-        # Проверяем, что после удаления поста данные сохранены в кэше
         self.assertEqual(cache_data.content, response_content)
-        # Проверяем, что после очистки кэша данные удалены
-        cache.clear()
+        # Удаление поста сбрасывает кэш
+        Post.objects.get(id=post_cache.id).delete()
         cache_delete = self.guest_client.get(self.REVERSE_INDEX)
         self.assertNotEqual(cache_delete.content, response_content)
+        self.assertNotContains(cache_delete, 'test_cache')
+
+    def test_cache_on_index_page_depends_on_page(self):
+        """Разные страницы index.html кэшируются отдельно."""
+        for i in range(VIEW_ELEMENTS):
+            Post.objects.create(author=self.user, text=f'test_page_{i}')
+        first_page = self.guest_client.get(self.REVERSE_INDEX)
+        second_page = self.guest_client.get(self.REVERSE_INDEX + '?page=2')
+        self.assertNotEqual(first_page.content, second_page.content)
+        self.assertContains(second_page, self.post.text)
+
+    def test_cached_index_does_not_query_posts(self):
+        """Главная страница из кэша фрагмента не запрашивает посты."""
+        self.authorized_client.get(self.REVERSE_INDEX)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(self.REVERSE_INDEX)
+        self.assertContains(response, self.post.text)
+        self.assertFalse([
+            query for query in queries
+            if 'FROM "posts_post"' in query['sql']
+        ])
+
+    def test_cached_index_shows_new_comment_count(self):
+        """Количество комментариев на главной странице
+        обновляется после добавления и удаления комментария."""
+        self.authorized_client.get(self.REVERSE_INDEX)
+        comment = Comment.objects.create(
+            post=self.post_followed, author=self.user, text='comment'
+        )
+        response = self.authorized_client.get(self.REVERSE_INDEX)
+        self.assertContains(response, 'Комментариев: 1')
+        comment.delete()
+        response = self.authorized_client.get(self.REVERSE_INDEX)
+        self.assertNotContains(response, 'Комментариев: 1')
+
+    def test_post_fragment_cache_uses_post_version(self):
+        """Разметка поста берется из кэша, пока пост не изменен."""
+        self.guest_client.get(self.REVERSE_PROFILE)
+        Post.objects.filter(id=self.post.id).update(text='not_saved')
+        response = self.guest_client.get(self.REVERSE_PROFILE)
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, 'not_saved')
+        self.authorized_client.post(
+            self.REVERSE_POST_EDIT, {'text': 'edited', 'group': self.group.id}
+        )
+        response = self.guest_client.get(self.REVERSE_PROFILE)
+        self.assertContains(response, 'edited')
 
     def test_autorized_client_follow(self):
         """Авторизованный пользователь может:
@@ -273,3 +334,245 @@ class PostPagesTest(TestCase):
         # т.к. user_followed не подписан на user_followed
         response1 = self.not_follower.get(reverse('posts:follow_index'))
         self.assertNotContains(response1, self.post_followed.text)
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author, text='old')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def tearDown(self) -> None:
+        cache.clear()
+
+    def get_feed(self):
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_feed_is_materialized(self):
+        """Подписка добавляет в ленту старые посты автора,
+        новые посты раскладываются по лентам,
+        отписка очищает ленту."""
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=(self.author,))
+        )
+        new_post = Post.objects.create(author=self.author, text='new')
+        self.assertEqual(
+            FeedEntry.objects.filter(user=self.user).count(), 2
+        )
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=(self.author,))
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_feed(), [])
+
+    @override_settings(TASK_BACKEND='core.tasks.DatabaseBackend')
+    def test_fan_out_runs_in_background(self):
+        """Раскладка поста по лентам выполняется воркером,
+        а не во время запроса."""
+        Follow.objects.create(user=self.user, author=self.author)
+        run_pending()
+        new_post = Post.objects.create(author=self.author, text='new')
+        self.assertFalse(
+            FeedEntry.objects.filter(user=self.user, post=new_post).exists()
+        )
+        run_pending()
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    @override_settings(POSTS_FANOUT_FOLLOWER_LIMIT=0)
+    def test_popular_author_posts_are_read_on_demand(self):
+        """Посты авторов с большим количеством подписчиков
+        не раскладываются по лентам, но видны в ленте."""
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='new')
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+        self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+    def test_author_below_limit_again_keeps_posts_in_feed(self):
+        """Посты, опубликованные, пока у автора было много подписчиков,
+        остаются в ленте, когда подписчиков становится меньше."""
+        other = User.objects.create_user(username='other')
+        with self.settings(POSTS_FANOUT_FOLLOWER_LIMIT=1):
+            Follow.objects.create(user=self.user, author=self.author)
+            Follow.objects.create(user=other, author=self.author)
+            new_post = Post.objects.create(author=self.author, text='new')
+        Follow.objects.filter(user=other).delete()
+        with self.settings(POSTS_FANOUT_FOLLOWER_LIMIT=1):
+            self.assertEqual(self.get_feed(), [new_post, self.old_post])
+
+
+class CommentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='auth'), text='Пост'
+        )
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=User.objects.create_user(username=f'user{i}'),
+                text=f'Комментарий {i}'
+            )
+            for i in range(VIEW_ELEMENTS + 3)
+        )
+
+    def test_comment_authors_are_loaded_with_comments(self):
+        url = reverse('posts:post_detail', args=(self.post.id,))
+        # Время изменения поста, пост и страница комментариев
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), VIEW_ELEMENTS)
+        self.assertContains(response, 'user12')
+
+    def test_json_endpoint_pages_through_comments(self):
+        """Следующие комментарии подгружаются по ссылке next,
+        каждый комментарий приходит один раз."""
+        url = reverse('posts:post_comments', args=(self.post.id,))
+        received = []
+        while url:
+            data = self.client.get(url).json()
+            received += [comment['id'] for comment in data['comments']]
+            url = data['next']
+        self.assertEqual(
+            received,
+            list(self.post.comments.order_by('-created', '-id')
+                 .values_list('id', flat=True))
+        )
+        response = self.client.get(
+            reverse('posts:post_comments', args=(self.post.id + 1,))
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ListingQueriesTest(TestCase):
+    """Количество запросов страницы со списком постов
+    не зависит от количества постов на ней."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.author = User.objects.create_user(username='author')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(25):
+            post = Post.objects.create(
+                author=User.objects.create_user(username=f'user{i}'),
+                group=cls.group,
+                text=f'Пост про котов {i}'
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Да')
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def count_queries(self, url, per_page):
+        cache.clear()
+        with mock.patch('posts.views.VIEW_ELEMENTS', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+        self.assertEqual(len(response.context['page_obj']), per_page)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=кот',
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 5), self.count_queries(url, 20)
+                )
+
+    def test_comment_count_is_annotated(self):
+        response = self.client.get(
+            reverse('posts:group_list', args=(self.group.slug,))
+        )
+        for post in response.context['page_obj']:
+            self.assertEqual(post.comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Пост'
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(cls.group.slug,)),
+            reverse('posts:profile', args=(cls.user.username,)),
+            reverse('posts:post_detail', args=(cls.post.id,)),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def revalidate(self, url, response):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        ).status_code
+
+    def test_unchanged_pages_return_not_modified(self):
+        """Повторный запрос с ETag получает 304 без шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertIn('Last-Modified', response)
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertFalse(not_modified.templates)
+
+    def test_changes_invalidate_etag(self):
+        responses = {url: self.client.get(url) for url in self.urls}
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response), 200)
+        response = self.client.get(self.urls[0])
+        post = Post.objects.get(id=self.post.id)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertEqual(self.revalidate(self.urls[0], response), 200)
+
+    def test_deleted_comment_and_author_post_invalidate_etag(self):
+        """Удаление не последнего комментария меняет ETag поста
+        и списков (в них выводится количество комментариев),
+        новый пост автора меняет ETag страницы поста."""
+        first = Comment.objects.create(
+            post=self.post, author=self.user, text='Первый'
+        )
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        responses = {url: self.client.get(url) for url in self.urls}
+        first.delete()
+        for url, response in responses.items():
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response), 200)
+        post_url = self.urls[-1]
+        response = self.client.get(post_url)
+        Post.objects.create(author=self.user, text='Еще пост')
+        self.assertEqual(self.revalidate(post_url, response), 200)
+
+    def test_no_etag_for_authorized_user(self):
+        self.client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotIn('ETag', self.client.get(url))
@@ -0,0 +1,56 @@
+from PIL import features
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from core.tasks import enqueue
+
+from .storage import post_image_storage
+
+# Варианты картинки поста для srcset (тег post_image).
+# medium совпадает с прежней миниатюрой 960x339 и служит
+# значением src для браузеров без поддержки srcset.
+RENDITIONS = (
+    ('small', '480x170', {'crop': 'center'}),
+    ('medium', '960x339', {'crop': 'center', 'upscale': True}),
+    ('large', '1920x678', {'crop': 'center'}),
+)
+FALLBACK_RENDITION = 'medium'
+# WebP отдается, только если Pillow собран с libwebp
+WEBP_ENABLED = features.check('webp')
+WEBP_OPTIONS = {'format': 'WEBP', 'quality': 80}
+
+
+def rendition_options():
+    """Все сочетания (имя, размер, параметры) миниатюр,
+    включая WebP-варианты."""
+    for name, geometry, options in RENDITIONS:
+        yield name, geometry, options
+        if WEBP_ENABLED:
+            yield f'{name}_webp', geometry, {**options, **WEBP_OPTIONS}
+
+
+def source_image(image):
+    """Картинка поста для sorl. Ключ миниатюры строится
+    и по имени, и по хранилищу файла, поэтому имя картинки
+    связывается с хранилищем поля Post.image - иначе sorl взял бы
+    default_storage, и тег post_image не нашел бы готовые миниатюры."""
+    if isinstance(image, str):
+        return ImageFile(image, post_image_storage)
+    return image
+
+
+def generate_thumbnails(image):
+    """Создает миниатюры всех размеров, чтобы при выводе
+    страницы sorl только находил готовую миниатюру."""
+    for _, geometry, options in rendition_options():
+        get_thumbnail(source_image(image), geometry, **options)
+
+
+def schedule_thumbnails(post):
+    """Ставит создание миниатюр картинки поста в очередь задач
+    (core.tasks): каждый размер - отдельная задача, которую
+    бэкенд очереди выполняет и при ошибке повторяет."""
+    if not post.image:
+        return
+    for _, geometry, options in rendition_options():
+        enqueue('posts.tasks.thumbnail', post.image.name, geometry, options)
@@ -1,11 +1,244 @@
-from django.core.paginator import Paginator
+from collections.abc import Sequence
 
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connection
+from django.db.models import (
+    Count, IntegerField, Max, OuterRef, Q, Subquery, Value
+)
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
 
-def split_pages(request, post_list, VIEW_ELEMENTS):
+from .models import Comment
+
+CURSOR_SALT = 'posts.cursor'
+# Поля, по которым KeysetPaginator упорядочивает записи:
+# дата и id для однозначного порядка при одинаковых датах
+KEYSET_KEY = ('pub_date', 'id')
+# Сколько секунд хранить в кэше общее количество записей
+COUNT_CACHE_TIMEOUT = 60
+APPROXIMATE_COUNT_TIMEOUT = 60 * 10
+# Столбцы автора и группы, которые не выводятся в ленте постов
+LISTING_DEFERRED = (
+    'author__password',
+    'author__last_login',
+    'author__email',
+    'author__date_joined',
+    'group__description',
+)
+
+
+def for_listing(post_list):
+    """Готовит посты для вывода списком: автор и группа
+    приходят в том же запросе без лишних столбцов,
+    количество комментариев считается подзапросом
+    только для постов страницы."""
+    comment_count = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(total=Count('id')).values('total')
+    return post_list.select_related('author', 'group').defer(
+        *LISTING_DEFERRED
+    ).annotate(comment_count=Coalesce(
+        Subquery(comment_count, output_field=IntegerField()), Value(0)
+    ))
+
+
+def cached_count(queryset, key, timeout=COUNT_CACHE_TIMEOUT):
+    """Возвращает функцию, которая берет количество записей
+    из кэша и считает их в базе только при промахе."""
+    return lambda: cache.get_or_set(
+        f'posts:count:{key}', queryset.count, timeout
+    )
+
+
+def estimate_count(model):
+    """Оценивает количество строк в таблице модели без COUNT(*):
+    в PostgreSQL по статистике планировщика,
+    в остальных базах по максимальному id."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE relname = %s',
+                [model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return row[0]
+    return model._default_manager.aggregate(total=Max('id'))['total'] or 0
+
+
+def approximate_count(model, timeout=APPROXIMATE_COUNT_TIMEOUT):
+    """Возвращает функцию с приблизительным количеством записей
+    модели. Подходит для ленты всех постов, где точное
+    число страниц не важно."""
+    return lambda: cache.get_or_set(
+        f'posts:count:approximate:{model._meta.label_lower}',
+        lambda: estimate_count(model),
+        timeout
+    )
+
+
+class CountedPaginator(Paginator):
+    """Паджинатор, который берет общее количество записей
+    у переданной функции вместо SELECT COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count):
+        super().__init__(object_list, per_page)
+        self._count = count
+
+    @cached_property
+    def count(self):
+        return self._count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор для админки: без фильтров количество записей
+    берется из approximate_count, с фильтрами считается COUNT(*),
+    который ограничен условиями поиска."""
+
+    @cached_property
+    def count(self):
+        if self.object_list.query.where:
+            return super().count
+        return approximate_count(self.object_list.model)()
+
+
+def encode_cursor(obj, key, reverse=False):
+    """Упаковывает позицию записи по ключу (дата, id)
+    в непрозрачную строку."""
+    date_field, id_field = key
+    return signing.dumps(
+        {
+            'k': getattr(obj, date_field).isoformat(),
+            'id': getattr(obj, id_field),
+            'r': reverse
+        },
+        salt=CURSOR_SALT,
+        compress=True
+    )
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор. Для пустого или подделанного
+    курсора возвращает None — тогда показывается первая страница."""
+    if not cursor:
+        return None
+    try:
+        return signing.loads(cursor, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Паджинатор по ключу (дата, id) без COUNT(*) и OFFSET.
+
+    Вместо номера страницы принимает курсор, полученный
+    с соседней страницы, поэтому любая страница стоит
+    столько же, сколько первая."""
+    keyset = True
+
+    def __init__(self, object_list, per_page, cursor=None, key=KEYSET_KEY):
+        super().__init__(object_list, per_page)
+        self.cursor = decode_cursor(cursor)
+        self.key = key
+
+    @cached_property
+    def _window(self):
+        (date_field, id_field), queryset = self.key, self.object_list
+        cursor = self.cursor
+        reverse = bool(cursor and cursor['r'])
+        if cursor:
+            lookup = 'gt' if reverse else 'lt'
+            queryset = queryset.filter(
+                Q(**{f'{date_field}__{lookup}': cursor['k']})
+                | Q(**{
+                    date_field: cursor['k'],
+                    f'{id_field}__{lookup}': cursor['id']
+                })
+            )
+        if reverse:
+            queryset = queryset.order_by(date_field, id_field)
+        else:
+            queryset = queryset.order_by(f'-{date_field}', f'-{id_field}')
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+            return rows, True, has_more
+        return rows, has_more, cursor is not None
+
+    @property
+    def has_next(self):
+        return self._window[1]
+
+    @property
+    def has_previous(self):
+        return self._window[2]
+
+    @property
+    def next_cursor(self):
+        rows, has_next, _ = self._window
+        if has_next:
+            return encode_cursor(rows[-1], self.key)
+        return None
+
+    @property
+    def previous_cursor(self):
+        rows, _, has_previous = self._window
+        if has_previous and rows:
+            return encode_cursor(rows[0], self.key, reverse=True)
+        return None
+
+    @property
+    def num_pages(self):
+        # Страницы считаются только в окне вокруг текущей,
+        # чтобы методы Page работали без COUNT(*).
+        return 1 + self.has_previous + self.has_next
+
+    def page(self, number=None):
+        # Для страницы вперед номер известен по курсору, и запрос
+        # откладывается до первого обращения к записям: страница,
+        # взятая из кэша фрагмента, базу не запрашивает
+        if self.cursor and self.cursor['r']:
+            number = 1 + self.has_previous
+        else:
+            number = 1 + (self.cursor is not None)
+        return Page(WindowRows(self), number, self)
+
+
+class WindowRows(Sequence):
+    """Записи страницы KeysetPaginator, которые читаются из базы
+    при первом обращении."""
+
+    def __init__(self, paginator):
+        self.paginator = paginator
+
+    def __getitem__(self, index):
+        return self.paginator._window[0][index]
+
+    def __len__(self):
+        return len(self.paginator._window[0])
+
+
+def split_pages(request, post_list, VIEW_ELEMENTS, keyset=False, count=None,
+                keyset_key=KEYSET_KEY):
     # Показывать на странице кол-во записей = VIEW_ELEMENTS.
-    paginator = Paginator(post_list, VIEW_ELEMENTS)
-    # Из URL извлекаем номер запрошенной страницы - это значение параметра page
+    # Номер страницы в URL (?page=) всегда обрабатывается обычным
+    # паджинатором, чтобы старые ссылки продолжали работать.
     page_number = request.GET.get('page')
+    if keyset and page_number is None:
+        paginator = KeysetPaginator(
+            post_list, VIEW_ELEMENTS, request.GET.get('cursor'), keyset_key
+        )
+        return paginator.page()
+    # count - функция, возвращающая общее количество записей
+    # (см. cached_count и approximate_count)
+    if count is not None:
+        paginator = CountedPaginator(post_list, VIEW_ELEMENTS, count)
+    else:
+        paginator = Paginator(post_list, VIEW_ELEMENTS)
     # Получаем набор записей для страницы с запрошенным номером
     page_obj = paginator.get_page(page_number)
 
@@ -1,28 +1,96 @@
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
+from django.urls import reverse
+from django.utils.http import urlencode
 from django.contrib.auth.decorators import login_required
 
-from .models import Post, Group, Follow, User
-from .utils import split_pages
+from core.edge import edge_cache
+from core.pagecache import cache_anonymous_page
+from core.routers import use_replica
+
+from .models import Comment, Post, Group, Follow, User
+from .caching import INDEX_CACHE_TIMEOUT, INDEX_VERSION_KEY, get_version
+from .conditional import (
+    conditional_page, group_modified, index_modified, post_modified,
+    profile_modified
+)
+from .feed import FEED_KEYSET_KEY, feed_posts, feed_size
+from .search import search_posts
+from .thumbnails import schedule_thumbnails
+from .utils import (
+    approximate_count, cached_count, for_listing, split_pages
+)
 from .forms import PostForm, CommentForm
 
 
 VIEW_ELEMENTS = 10
+SEARCH_QUERY_MAX_LENGTH = 200
+# Комментарии листаются по курсору (дата, id), см. индекс
+# posts_comment_post_date_idx
+COMMENT_KEYSET_KEY = ('created', 'id')
+# Сколько секунд страницы хранятся на прокси: списки обновляются
+# часто, а пост сбрасывается по ключу при любом изменении
+LISTING_EDGE_TIMEOUT = 60
+POST_EDGE_TIMEOUT = 60 * 10
+
+
+# Ключи страниц: по ним страницы сбрасываются на прокси
+# (core.edge.purge) и в кэше страниц (core.pagecache.invalidate_pages)
+def index_keys(request):
+    return ['index']
+
+
+def group_keys(request, slug):
+    return [f'group:{slug}']
+
+
+def profile_keys(request, username):
+    return [f'author:{username}']
+
+
+def post_keys(request, post_id):
+    return [f'post:{post_id}']
+
+
+def load_comments(request, post_id):
+    '''Страница комментариев поста вместе с авторами.'''
+    comments = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    return split_pages(
+        request, comments, VIEW_ELEMENTS, keyset=True,
+        count=cached_count(comments, f'comments:{post_id}'),
+        keyset_key=COMMENT_KEYSET_KEY
+    )
 
 
 # Главная страница
+@cache_anonymous_page(index_keys)
+@use_replica
+@edge_cache(s_maxage=LISTING_EDGE_TIMEOUT, keys=index_keys)
+@conditional_page(index_modified)
 def index(request):
     '''Передаёт в шаблон posts/index.html
     десять объектов модели Post на каждой странице.'''
     template = 'posts/index.html'
-    post_list = Post.objects.all()
+    post_list = for_listing(Post.objects.all())
     context = {
-        'page_obj': split_pages(request, post_list, VIEW_ELEMENTS),
+        'page_obj': split_pages(
+            request, post_list, VIEW_ELEMENTS, keyset=True,
+            count=approximate_count(Post)
+        ),
+        'index_version': get_version(INDEX_VERSION_KEY),
+        'index_timeout': INDEX_CACHE_TIMEOUT,
     }
     return render(request, template, context)
 
 
 # Страница с групповыми постами
+@cache_anonymous_page(group_keys)
+@use_replica
+@edge_cache(s_maxage=LISTING_EDGE_TIMEOUT, keys=group_keys)
+@conditional_page(group_modified)
 def group_posts(request, slug):
     '''Передаёт в шаблон posts/group_list.html
     десять объектов модели Post на каждой странице,
@@ -33,45 +101,117 @@ def group_posts(request, slug):
     post_list = group.posts.all()
     context = {
         'group': group,
-        'page_obj': split_pages(request, post_list, VIEW_ELEMENTS),
+        'page_obj': split_pages(
+            request, for_listing(post_list), VIEW_ELEMENTS, keyset=True,
+            count=cached_count(post_list, f'group:{group.id}')
+        ),
+    }
+    return render(request, template, context)
+
+
+@use_replica
+def search(request):
+    '''Передаёт в шаблон posts/search.html посты,
+    найденные по запросу из параметра q,
+    от наиболее подходящих к менее подходящим.'''
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()[:SEARCH_QUERY_MAX_LENGTH]
+    post_list = search_posts(query) if query else Post.objects.none()
+    context = {
+        'query': query,
+        # Количество считаем по запросу без аннотаций: в SQLite
+        # bm25() нельзя вызвать во вложенном подсчете
+        'page_obj': split_pages(
+            request, for_listing(post_list), VIEW_ELEMENTS,
+            count=post_list.count
+        ),
+        # Добавляется к ссылкам паджинатора, чтобы не терять запрос
+        'page_query': urlencode({'q': query}),
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page(profile_keys)
+@use_replica
+@edge_cache(s_maxage=LISTING_EDGE_TIMEOUT, keys=profile_keys)
+@conditional_page(profile_modified)
 def profile(request, username):
     """Передает автора с указнным username в шаблон posts/profile
     и его посты по 10 штук на страницу"""
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counter'),
+        username=username
+    )
     post_list = author.posts.all()
     following = (
         request.user.is_authenticated
         and author.following.filter(user=request.user).exists())
     context = {
-        'page_obj': split_pages(request, post_list, VIEW_ELEMENTS),
+        'page_obj': split_pages(
+            request, for_listing(post_list), VIEW_ELEMENTS, keyset=True,
+            count=cached_count(post_list, f'author:{author.id}')
+        ),
         'author': author,
         'following': following
     }
     return render(request, template, context)
 
 
+@use_replica
+@edge_cache(s_maxage=POST_EDGE_TIMEOUT, keys=post_keys)
+@conditional_page(post_modified)
 def post_detail(request, post_id):
     """Передает пост с указанной post_id в шабон posts/post_detail"""
     template = 'posts/post_detail.html'
     post = get_object_or_404(
-        Post.objects.select_related('group', 'author'),
+        Post.objects.select_related('group', 'author', 'author__counter'),
         id=post_id
     )
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'post': post,
         'form': form,
-        'page_obj': split_pages(request, comments, VIEW_ELEMENTS)
+        'page_obj': load_comments(request, post.id)
     }
     return render(request, template, context)
 
 
+@use_replica
+def post_comments(request, post_id):
+    """Отдает в JSON страницу комментариев поста
+    и ссылку на следующую, чтобы подгружать их по частям."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    page_obj = load_comments(request, post.id)
+    next_url = None
+    if getattr(page_obj.paginator, 'keyset', False):
+        if page_obj.paginator.has_next:
+            next_url = '?'.join((
+                reverse('posts:post_comments', args=(post.id,)),
+                urlencode({'cursor': page_obj.paginator.next_cursor})
+            ))
+    elif page_obj.has_next():
+        next_url = '?'.join((
+            reverse('posts:post_comments', args=(post.id,)),
+            urlencode({'page': page_obj.next_page_number()})
+        ))
+    return JsonResponse({
+        'comments': [
+            {
+                'id': comment.id,
+                'author': comment.author.username,
+                'author_url': reverse(
+                    'posts:profile', args=(comment.author.username,)
+                ),
+                'text': comment.text,
+                'created': comment.created,
+            }
+            for comment in page_obj
+        ],
+        'next': next_url,
+    })
+
+
 @login_required
 def post_create(request):
     """Передает форму из PostForm в шаблон posts/create_post.html
@@ -87,6 +227,7 @@ def post_create(request):
             post = form.save(commit=False)
             post.author = request.user
             post.save()
+            schedule_thumbnails(post)
             return redirect('posts:profile', request.user)
         return render(request, template, {'form': form})
 
@@ -119,6 +260,8 @@ def post_edit(request, post_id):
         )
         if form.is_valid():
             form.save()
+            if 'image' in form.changed_data:
+                schedule_thumbnails(post)
             return redirect('posts:post_detail', post_id=post.id)
 
     context = {
@@ -143,15 +286,20 @@ def add_comment(request, post_id):
     return redirect('posts:post_detail', post_id=post.id)
 
 
+@use_replica
 @login_required
 def follow_index(request):
     """Выведит посты авторов, на которых подписан текущий пользователь"""
     template = 'posts/follow.html'
-    following = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author')
+    following = for_listing(feed_posts(request.user))
     context = {
-        'page_obj': split_pages(request, following, VIEW_ELEMENTS)
+        'page_obj': split_pages(
+            request, following, VIEW_ELEMENTS, keyset=True,
+            count=cached_count(
+                feed_size(request.user), f'follow:{request.user.id}'
+            ),
+            keyset_key=FEED_KEYSET_KEY
+        )
     }
     return render(request, template, context)
 
@@ -0,0 +1,21 @@
+"""
+ASGI config for yatube project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.2 has no native ASGI support: the WSGI application is wrapped
+in ``asgiref.wsgi.WsgiToAsgi``, which runs requests in the asgiref thread
+pool (its size is set by the ``ASGI_THREADS`` environment variable).
+
+Run with any ASGI server, for example::
+
+    uvicorn yatube.asgi:application --workers 2
+"""
+
+import os
+
+from asgiref.wsgi import WsgiToAsgi
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+application = WsgiToAsgi(get_wsgi_application())
@@ -57,6 +57,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -85,12 +87,50 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# База выбирается переменной окружения YATUBE_DB:
+# sqlite - файл db.sqlite3 (по умолчанию, для локального запуска),
+# postgresql - PostgreSQL (нужен пакет psycopg2), параметры
+# подключения берутся из переменных POSTGRES_* и DB_*.
+# Если задан DB_REPLICA_HOST, добавляется реплика для чтения 'replica'.
+DATABASE = os.getenv('YATUBE_DB', 'sqlite')
+
+if DATABASE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'yatube'),
+            'USER': os.getenv('POSTGRES_USER', 'yatube'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', '127.0.0.1'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            # Постоянные соединения: не открываем новое на каждый запрос.
+            # Для пула соединений между процессами поставьте перед
+            # базой pgbouncer и укажите его в DB_HOST/DB_PORT
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        }
+    }
+    if os.getenv('DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.getenv('DB_REPLICA_HOST'),
+            'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv(
+                'SQLITE_PATH', os.path.join(BASE_DIR, 'db.sqlite3')
+            ),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+        }
     }
-}
+
+# Чтения view, помеченных core.routers.use_replica, идут на реплику
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Сколько секунд после записи читать из основной базы
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
 
 
 # Password validation
@@ -145,10 +185,68 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Ограничения для картинок постов (см. posts.forms.normalize_image)
+POSTS_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POSTS_IMAGE_MAX_PIXELS = 40_000_000
+POSTS_IMAGE_MAX_DIMENSION = 2560
+POSTS_IMAGE_QUALITY = 85
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Кэш выбирается переменной окружения YATUBE_CACHE:
+# locmem - кэш процесса (по умолчанию, для разработки и тестов),
+# redis - общий кэш всех воркеров (нужен пакет django-redis),
+# db или file - общий кэш без отдельного сервера
+# (для db выполните python3 manage.py createcachetable)
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'redis': 'django_redis.cache.RedisCache',
+    'db': 'django.core.cache.backends.db.DatabaseCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+}
+CACHE_DEFAULT_LOCATIONS = {
+    'locmem': '',
+    'redis': 'redis://127.0.0.1:6379/1',
+    'db': 'yatube_cache',
+    'file': os.path.join(BASE_DIR, 'cache'),
+}
+CACHE_BACKEND = os.getenv('YATUBE_CACHE', 'locmem')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': CACHE_BACKENDS[CACHE_BACKEND],
+        'LOCATION': os.getenv(
+            'YATUBE_CACHE_LOCATION', CACHE_DEFAULT_LOCATIONS[CACHE_BACKEND]
+        ),
+        # Префикс и версия ключей позволяют нескольким окружениям
+        # делить один сервер кэша и сбрасывать кэш при выкладке
+        'KEY_PREFIX': os.getenv('YATUBE_CACHE_PREFIX', 'yatube'),
+        'VERSION': int(os.getenv('YATUBE_CACHE_VERSION', 1)),
     }
 }
+
+# Сколько секунд хранить страницы для анонимных посетителей
+# (core.middleware.AnonymousPageCacheMiddleware)
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 10))
+
+# Сброс кэша обратного прокси по ключам Surrogate-Key (core.edge):
+# по умолчанию ключи только пишутся в лог, для прокси укажите
+# core.edge.HttpPurgeBackend и адрес EDGE_PURGE_URL
+EDGE_PURGE_BACKEND = os.getenv(
+    'EDGE_PURGE_BACKEND', 'core.edge.LoggingPurgeBackend'
+)
+EDGE_PURGE_URL = os.getenv('EDGE_PURGE_URL', '')
+EDGE_PURGE_METHOD = os.getenv('EDGE_PURGE_METHOD', 'PURGE')
+
+# Очередь фоновых задач (core.tasks): ThreadBackend выполняет
+# задачи в потоках процесса после фиксации транзакции,
+# DatabaseBackend - командой python3 manage.py run_tasks,
+# ImmediateBackend - сразу внутри запроса. SQLite допускает одного пишущего, и потоки
+# задач ждали бы блокировку вместе с запросами (а тестовая база
+# в памяти из потоков недоступна), поэтому с ней задачи
+# по умолчанию выполняются сразу
+TASK_BACKEND = os.getenv(
+    'TASK_BACKEND',
+    'core.tasks.ThreadBackend' if DATABASE == 'postgresql'
+    else 'core.tasks.ImmediateBackend'
+)
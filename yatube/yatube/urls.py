@@ -18,13 +18,16 @@ from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import cache_health
+
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
-    path('about', include('about.urls', namespace='about'))
+    path('about', include('about.urls', namespace='about')),
+    path('health/cache/', cache_health, name='cache_health'),
 ]
 
 handler404 = 'core.views.page_not_found'